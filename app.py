@@ -2,12 +2,10 @@ import os
 import sys
 from src.utils.logger import setup_logging
 from src.api.routes import app
-from dotenv import load_dotenv
 
 print("Starting application...")
 
-# Load environment variables
-load_dotenv()
+# Environment variables were loaded from .env when src.config.settings was imported
 print("Environment variables loaded")
 
 # Setup logging
@@ -18,17 +16,19 @@ if __name__ == "__main__":
     print("Running as main module")
     logger.info("Starting Azure DevOps Log Analyzer")
     
-    # Get port from environment or use default (now 7000)
+    # Get port and debug flag from environment or use defaults (port now 7000)
     port = int(os.environ.get("PORT", 7000))
+    debug = os.environ.get("FLASK_DEBUG", "False").lower() == "true"
     print(f"Using port {port}")
     
-    # Dump environment variables for debugging
+    # Dump the relevant environment variables for debugging
     print("Environment variables:")
-    for key, value in os.environ.items():
-        if key.startswith(("FLASK", "AI_", "OPENAI", "GEMINI", "OPENROUTER")):
+    for key in ("FLASK_DEBUG", "AI_API_KEY", "OPENAI_API_KEY", "GEMINI_API_KEY", "OPENROUTER_API_KEY"):
+        value = os.environ.get(key)
+        if value is not None:
             sanitized_value = value[:5] + "..." if "KEY" in key else value
             print(f"  {key}={sanitized_value}")
     
     # Run app
-    print(f"Running app on 0.0.0.0:{port} with debug={os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'}")
-    app.run(host="0.0.0.0", port=port, debug=os.environ.get("FLASK_DEBUG", "False").lower() == "true") 
\ No newline at end of file
+    print(f"Running app on 0.0.0.0:{port} with debug={debug}")
+    app.run(host="0.0.0.0", port=port, debug=debug) 
\ No newline at end of file
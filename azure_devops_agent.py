@@ -1,11 +1,14 @@
 import os
 import json
+import base64
+import functools
 import requests
 import re
 import unittest
 from unittest.mock import patch, MagicMock
 import logging
-from flask import Flask, request, jsonify, render_template_string
+from flask import Flask, request, jsonify
+from jinja2 import Template
 from typing import Dict, List, Optional, Tuple
 from openai import OpenAI
 import httpx
@@ -25,11 +28,13 @@ class AzureDevOpsClient:
     def __init__(self, pat: str, organization: str):
         self.pat = pat
         self.organization = organization
-        self.headers = {"Authorization": f"Basic {self._encode_pat(pat)}"}
+        self._auth_header = f"Basic {self._encode_pat(pat)}"
+        self.headers = {"Authorization": self._auth_header}
         logger.info(f"Initialized Azure DevOps client for organization: {organization}")
 
-    def _encode_pat(self, pat: str) -> str:
-        import base64
+    @staticmethod
+    @functools.lru_cache(maxsize=8)
+    def _encode_pat(pat: str) -> str:
         return base64.b64encode(f":{pat}".encode()).decode()
 
     def parse_azure_devops_url(self, url: str) -> Dict:
@@ -242,6 +247,56 @@ class DevOpsAgent:
 devops_agent = DevOpsAgent()
 
 
+_INDEX_HTML = """
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Azure DevOps Error Analyzer</title>
+    <style>
+        body { font-family: Arial, sans-serif; margin: 20px; line-height: 1.6; }
+        .container { max-width: 800px; margin: 0 auto; }
+        h1 { color: #0078d7; }
+        form { margin: 20px 0; padding: 20px; background: #f9f9f9; border-radius: 8px; }
+        label { display: block; margin-bottom: 5px; font-weight: bold; }
+        input[type="text"], textarea { width: 100%; padding: 8px; margin-bottom: 15px; border: 1px solid #ddd; border-radius: 4px; }
+        textarea { height: 100px; }
+        input[type="submit"] { background: #0078d7; color: white; border: none; padding: 10px 15px; border-radius: 4px; cursor: pointer; }
+        input[type="submit"]:hover { background: #005a9e; }
+        .result { margin-top: 20px; padding: 20px; background: #f0f7ff; border-radius: 8px; white-space: pre-wrap; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <h1>Azure DevOps Error Analyzer</h1>
+        <p>Enter an Azure DevOps build URL and your question about the build errors.</p>
+
+        <form method="post">
+            <div>
+                <label for="url">Azure DevOps URL:</label>
+                <input type="text" id="url" name="url" placeholder="https://azure.asax.ir/tfs/AsaProjects/..." required>
+            </div>
+            <div>
+                <label for="query">Your Question:</label>
+                <textarea id="query" name="query" placeholder="What caused this build to fail and how can I fix it?"></textarea>
+            </div>
+            <input type="submit" value="Analyze">
+        </form>
+
+        {% if result %}
+        <div class="result">
+            <h2>Analysis Result:</h2>
+            {{ result }}
+        </div>
+        {% endif %}
+    </div>
+</body>
+</html>
+"""
+
+# Compiled once at import; autoescape matches render_template_string
+_INDEX_TMPL = Template(_INDEX_HTML, autoescape=True)
+
+
 # Web UI route
 @app.route('/', methods=['GET', 'POST'])
 def index():
@@ -252,53 +307,7 @@ def index():
         text = f"{url} {query}"
         result = devops_agent.process_request(text, "web_user")
 
-    html = """
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Azure DevOps Error Analyzer</title>
-        <style>
-            body { font-family: Arial, sans-serif; margin: 20px; line-height: 1.6; }
-            .container { max-width: 800px; margin: 0 auto; }
-            h1 { color: #0078d7; }
-            form { margin: 20px 0; padding: 20px; background: #f9f9f9; border-radius: 8px; }
-            label { display: block; margin-bottom: 5px; font-weight: bold; }
-            input[type="text"], textarea { width: 100%; padding: 8px; margin-bottom: 15px; border: 1px solid #ddd; border-radius: 4px; }
-            textarea { height: 100px; }
-            input[type="submit"] { background: #0078d7; color: white; border: none; padding: 10px 15px; border-radius: 4px; cursor: pointer; }
-            input[type="submit"]:hover { background: #005a9e; }
-            .result { margin-top: 20px; padding: 20px; background: #f0f7ff; border-radius: 8px; white-space: pre-wrap; }
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>Azure DevOps Error Analyzer</h1>
-            <p>Enter an Azure DevOps build URL and your question about the build errors.</p>
-
-            <form method="post">
-                <div>
-                    <label for="url">Azure DevOps URL:</label>
-                    <input type="text" id="url" name="url" placeholder="https://azure.asax.ir/tfs/AsaProjects/..." required>
-                </div>
-                <div>
-                    <label for="query">Your Question:</label>
-                    <textarea id="query" name="query" placeholder="What caused this build to fail and how can I fix it?"></textarea>
-                </div>
-                <input type="submit" value="Analyze">
-            </form>
-
-            {% if result %}
-            <div class="result">
-                <h2>Analysis Result:</h2>
-                {{ result }}
-            </div>
-            {% endif %}
-        </div>
-    </body>
-    </html>
-    """
-
-    return render_template_string(html, result=result)
+    return _INDEX_TMPL.render(result=result)
 
 
 @app.route('/api/analyze', methods=['POST'])
@@ -0,0 +1,38 @@
+"""Compile .env into src/config/_settings_compiled.py.
+
+settings.py loads the compiled values instead of parsing .env on every start,
+as long as the .env file's SHA-256 still matches the one recorded here.
+Re-run after editing .env:
+
+    python compile_settings.py
+"""
+import hashlib
+import os
+import sys
+
+from dotenv import dotenv_values
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+OUTPUT = os.path.join(ROOT, "src", "config", "_settings_compiled.py")
+
+
+def compile_settings(env_path: str = os.path.join(ROOT, ".env"), output: str = OUTPUT) -> None:
+    with open(env_path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    values = {k: v for k, v in dotenv_values(env_path).items() if v is not None}
+
+    lines = [
+        "# Generated by compile_settings.py from .env; do not edit or commit.",
+        f"_COMPILED_PATH = {os.path.abspath(env_path)!r}",
+        f"_COMPILED_HASH = {digest!r}",
+        "_COMPILED_VALUES = {",
+        *(f"    {k!r}: {v!r}," for k, v in values.items()),
+        "}",
+    ]
+    with open(output, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    print(f"Compiled {len(values)} settings from {env_path} into {output}")
+
+
+if __name__ == "__main__":
+    compile_settings(*sys.argv[1:2])
@@ -0,0 +1,16 @@
+import os
+
+# gunicorn -c gunicorn.conf.py app:app
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '7000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+
+# Import the app (and build the module-level DevOpsAgent) once in the master
+# process; workers inherit it copy-on-write instead of each re-initializing the
+# Azure and AI clients. HTTP sessions and event loops are created lazily, so no
+# sockets are opened before the fork.
+preload_app = True
+
+# Progress streams stay open for the whole analysis; see the README for running
+# with gevent workers (worker_class = "gevent") when many users are connected.
+timeout = 120
@@ -5,13 +5,18 @@ setup(
     version="0.1.0",
     packages=find_packages(where="src"),
     package_dir={"": "src"},
+    package_data={"api": ["static/*"]},
     install_requires=[
-        "flask",
+        "flask[async]",
         "openai",
         "httpx",
         "requests",
         "python-dotenv",
         "google-generativeai",
+        "cachetools",
+        "orjson",
     ],
+    # Production server: gunicorn -c gunicorn.conf.py -k gevent app:app
+    extras_require={"server": ["gunicorn", "gevent"]},
     python_requires=">=3.8",
 ) 
\ No newline at end of file
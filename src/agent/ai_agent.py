@@ -1,33 +1,126 @@
+import re
 import logging
-from typing import Optional
-from src.agent.ai_providers import get_ai_provider
+from typing import Iterator, Optional
+from src.agent.ai_providers import AIProvider, get_cached_ai_provider
 from src.config.settings import DEFAULT_AI_PROVIDER
 
 logger = logging.getLogger(__name__)
 
+# Log lines worth keeping even when they fall outside the tail sent to the model
+_ERROR_LINE_RE = re.compile(r"(?mi)^.*(?:error|fail|exception|fatal|traceback).*$")
+# Placed between the collected error lines and the log tail
+_TAIL_SEPARATOR = "\n\n===== LOG TAIL =====\n\n"
+_MAX_PROMPT_LOG_CHARS = 65536
+
 class AIAnalysisAgent:
     def __init__(self, api_key: str = None, provider: str = None, model: str = None):
         """Initialize AI analysis agent with the specified provider."""
-        self.provider_name = provider or DEFAULT_AI_PROVIDER
-        self.model = model
+        # Only the (provider, model) choice is stored; the provider is built on first use
+        self._provider_cfg = (provider or DEFAULT_AI_PROVIDER, model)
         self.api_key = api_key
-        
-        # Initialize the appropriate provider
-        self.provider = get_ai_provider(self.provider_name, self.model)
         logger.info(f"Initialized AI analysis agent with provider: {self.provider_name}")
 
+    @property
+    def provider_name(self) -> str:
+        return self._provider_cfg[0]
+
+    @property
+    def model(self) -> Optional[str]:
+        return self._provider_cfg[1]
+
+    @property
+    def provider(self) -> AIProvider:
+        """The selected provider, created on first use and shared through the provider cache."""
+        return get_cached_ai_provider(*self._provider_cfg)
+
     def analyze_logs(self, logs: str, query: str) -> str:
         """Analyze logs using the selected AI provider."""
         logger.info(f"Analyzing logs with provider {self.provider_name}")
         try:
+            # Trim once here so oversized logs are not passed further down
+            logs = self._truncate_logs(logs)
             return self.provider.analyze_logs(logs, query)
         except Exception as e:
             logger.exception(f"Error in AI analysis: {e}")
             return f"Error analyzing logs: {str(e)}"
+
+
+    def stream_logs(self, logs: str, query: str) -> Iterator[str]:
+        """Analyze logs, yielding the analysis in chunks as the provider produces it."""
+        logger.info(f"Streaming log analysis with provider {self.provider_name}")
+        try:
+            logs = self._truncate_logs(logs)
+            yield from self.provider.stream_logs(logs, query)
+        except Exception as e:
+            logger.exception(f"Error in AI analysis: {e}")
+            yield f"Error analyzing logs: {str(e)}"
+
+    async def aanalyze_logs(self, logs: str, query: str) -> str:
+        """Async variant of analyze_logs."""
+        logger.info(f"Analyzing logs with provider {self.provider_name}")
+        try:
+            logs = self._truncate_logs(logs)
+            return await self.provider.aanalyze_logs(logs, query)
+        except Exception as e:
+            logger.exception(f"Error in AI analysis: {e}")
+            return f"Error analyzing logs: {str(e)}"
             
+    async def warmup(self) -> None:
+        """Warm up the provider's connection; failures are left for aanalyze_logs to report."""
+        try:
+            await self.provider.warmup()
+        except Exception as e:
+            logger.warning(f"Could not warm up provider {self.provider_name}: {e}")
+
     def change_provider(self, provider: str, model: Optional[str] = None) -> None:
         """Change the AI provider dynamically."""
         logger.info(f"Changing AI provider from {self.provider_name} to {provider}")
-        self.provider_name = provider
-        self.model = model
-        self.provider = get_ai_provider(provider, model) 
\ No newline at end of file
+        # Swap name and model in one assignment; the provider is resolved on next use
+        self._provider_cfg = (provider, model)
+
+    @property
+    def log_window_chars(self) -> int:
+        """How many characters from the end of the build logs to download.
+
+        Twice the prompt budget, so _truncate_logs has earlier output to pick
+        error lines from in addition to the tail it keeps.
+        """
+        try:
+            context_chars = self.provider.max_context_chars
+        except Exception as e:
+            # analyze_logs reports the error; download the default window meanwhile
+            logger.warning(f"Could not create provider {self.provider_name}: {e}")
+            context_chars = _MAX_PROMPT_LOG_CHARS
+        return 2 * min(_MAX_PROMPT_LOG_CHARS, context_chars)
+
+    def _truncate_logs(self, logs: str, max_chars: int = _MAX_PROMPT_LOG_CHARS) -> str:
+        """Fit logs into the prompt budget, keeping earlier error lines plus the log tail.
+        
+        Failures usually show up at the end of a build log, so the tail is kept
+        verbatim. Up to half of the budget goes to matching error lines from
+        before the tail, deduplicated and in order.
+        """
+        limit = min(max_chars, self.provider.max_context_chars)
+        if len(logs) <= limit:
+            return logs
+        
+        min_tail = limit // 2
+        error_budget = limit - min_tail - len(_TAIL_SEPARATOR)
+        error_lines, seen, used = [], set(), 0
+        for match in _ERROR_LINE_RE.finditer(logs, 0, len(logs) - min_tail):
+            line = match.group(0)
+            if line in seen:
+                continue
+            if used + len(line) + 1 > error_budget:
+                break
+            seen.add(line)
+            error_lines.append(line)
+            used += len(line) + 1
+        
+        if error_lines:
+            tail = logs[len(logs) - (limit - used - len(_TAIL_SEPARATOR)):]
+            trimmed = "\n".join(error_lines) + _TAIL_SEPARATOR + tail
+        else:
+            trimmed = logs[-limit:]
+        logger.info("Trimmed logs from %d to %d characters", len(logs), len(trimmed))
+        return trimmed
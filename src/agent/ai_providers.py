@@ -1,9 +1,13 @@
+import atexit
+import asyncio
+import functools
 import logging
+import threading
 import httpx
 from abc import ABC, abstractmethod
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Awaitable, Iterator, TypeVar
 import google.generativeai as genai
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 from src.config.settings import (
     AI_API_KEY, AI_API_BASE_URL, AI_MODEL,
     OPENROUTER_API_KEY, OPENROUTER_BASE_URL,
@@ -12,13 +16,172 @@ from src.config.settings import (
 
 logger = logging.getLogger(__name__)
 
+# One connection pool shared by every OpenAI-compatible provider so keep-alive
+# TLS sessions survive across analyses and provider switches
+_SHARED_HTTP_CLIENT = httpx.Client(
+    verify=False,
+    limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+    timeout=httpx.Timeout(60.0, connect=10.0)
+)
+atexit.register(_SHARED_HTTP_CLIENT.close)
+
+# Async counterpart of the shared pool. Async connections are bound to the event
+# loop they were opened on, so the client only ever runs on _shared_loop() and
+# callers on other loops (e.g. Flask async views) hop over with _run_on_shared_loop
+_SHARED_ASYNC_HTTP_CLIENT = httpx.AsyncClient(
+    verify=False,
+    limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+    timeout=httpx.Timeout(60.0, connect=10.0)
+)
+_SHARED_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_SHARED_LOOP_LOCK = threading.Lock()
+
+T = TypeVar("T")
+
+def _shared_loop() -> asyncio.AbstractEventLoop:
+    """Return the background event loop that owns the shared async clients."""
+    global _SHARED_LOOP
+    with _SHARED_LOOP_LOCK:
+        if _SHARED_LOOP is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="ai-providers-loop", daemon=True).start()
+            _SHARED_LOOP = loop
+    return _SHARED_LOOP
+
+async def _run_on_shared_loop(coro: Awaitable[T]) -> T:
+    """Await a coroutine on the shared loop from whichever loop the caller runs on."""
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, _shared_loop()))
+
+def _close_shared_async_client() -> None:
+    """Close the shared async client on the loop that owns its connections."""
+    if _SHARED_LOOP is not None:
+        asyncio.run_coroutine_threadsafe(_SHARED_ASYNC_HTTP_CLIENT.aclose(), _SHARED_LOOP).result(timeout=5)
+
+atexit.register(_close_shared_async_client)
+
+async def _open_connection(base_url: str) -> None:
+    """Open a pooled TLS connection to base_url so the next API call can reuse it."""
+    try:
+        await _run_on_shared_loop(_SHARED_ASYNC_HTTP_CLIENT.head(base_url))
+    except Exception as e:
+        logger.debug("Warmup request to %s failed: %s", base_url, e)
+
+# Prompt shared by all providers
+_PROMPT_TEMPLATE = (
+    "You are an expert in Azure DevOps build and release pipelines.\n"
+    "I'll provide you with build or release logs, and I need your help to understand what went wrong.\n\n"
+    "Please analyze these logs carefully and provide:\n"
+    "1. A clear explanation of what the error is\n"
+    "2. The most likely cause of the failure\n"
+    "3. Specific steps to fix the issue\n\n"
+    "Here's the specific question: {query}\n\n"
+    "Here are the logs:\n{logs}"
+)
+
+def _iter_completion_text(response: Any) -> Iterator[str]:
+    """Yield the text deltas of a streamed chat completion."""
+    for chunk in response:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+class BatchingAnalyzer:
+    """Collect concurrent chat completion requests and dispatch them together.
+    
+    Requests that arrive within batch_interval seconds of the first one, up to
+    max_batch_size, are sent concurrently on the shared loop with asyncio.gather.
+    Each caller gets its own response back through a per-request future.
+    """
+    
+    def __init__(self, client: AsyncOpenAI, max_batch_size: int = 10, batch_interval: float = 0.01):
+        self.client = client
+        self.max_batch_size = max_batch_size
+        self.batch_interval = batch_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._collector: Optional[asyncio.Task] = None
+    
+    async def submit(self, model: str, prompt: str) -> Any:
+        """Queue a completion request and wait for the API response."""
+        return await _run_on_shared_loop(self._submit(model, prompt))
+    
+    async def _submit(self, model: str, prompt: str) -> Any:
+        """Enqueue a request on the shared loop, starting the collector if it is idle."""
+        loop = asyncio.get_running_loop()
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        future = loop.create_future()
+        self._queue.put_nowait((model, prompt, future))
+        if self._collector is None:
+            self._collector = loop.create_task(self._collect_batches())
+        return await future
+    
+    async def _collect_batches(self) -> None:
+        """Group queued requests into batches until the queue is empty.
+        
+        The collector then exits so an idle batcher, e.g. of a provider evicted
+        from the provider cache, keeps no task alive on the shared loop; the next
+        submit starts a new one.
+        """
+        loop = asyncio.get_running_loop()
+        while not self._queue.empty():
+            batch = [self._queue.get_nowait()]
+            await asyncio.sleep(self.batch_interval)
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            # Dispatch without waiting so the next batch can be collected meanwhile
+            loop.create_task(self._dispatch(batch))
+        self._collector = None
+    
+    async def _dispatch(self, batch: List[tuple]) -> None:
+        """Send one batch concurrently and resolve each request's future."""
+        responses = await asyncio.gather(
+            *(self.client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}]
+            ) for model, prompt, _ in batch),
+            return_exceptions=True
+        )
+        for (_, _, future), response in zip(batch, responses):
+            if future.done():
+                continue
+            if isinstance(response, BaseException):
+                future.set_exception(response)
+            else:
+                future.set_result(response)
+
 class AIProvider(ABC):
     """Abstract base class for AI providers."""
     
+    # Maximum number of log characters sent to the model in one prompt
+    max_context_chars: int = 80000
+    
     @abstractmethod
     def analyze_logs(self, logs: str, query: str) -> str:
         """Analyze logs using AI and return the analysis."""
         pass
+    
+    def stream_logs(self, logs: str, query: str) -> Iterator[str]:
+        """Analyze logs, yielding the analysis in chunks as the model produces it.
+        
+        Providers that support streaming override this; the default yields the
+        complete analyze_logs result at once.
+        """
+        yield self.analyze_logs(logs, query)
+    
+    async def aanalyze_logs(self, logs: str, query: str) -> str:
+        """Analyze logs without blocking the event loop.
+        
+        Providers with a native async client override this; the default runs the
+        blocking analyze_logs in the loop's thread pool.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.analyze_logs, logs, query)
+    
+    async def warmup(self) -> None:
+        """Prepare the connection to the AI service ahead of a request (no-op by default)."""
+    
+    def _create_prompt(self, logs: str, query: str) -> str:
+        """Create the analysis prompt, trimming logs to the provider's context window."""
+        return _PROMPT_TEMPLATE.format_map({"query": query, "logs": logs[:self.max_context_chars]})
 
 class OpenAIProvider(AIProvider):
     """OpenAI implementation."""
@@ -29,49 +192,73 @@ class OpenAIProvider(AIProvider):
         self.base_url = base_url or AI_API_BASE_URL
         self.model = model or AI_MODEL
         
-        http_client = httpx.Client(verify=False)
         self.client = OpenAI(
             base_url=self.base_url,
             api_key=self.api_key,
-            http_client=http_client
+            http_client=_SHARED_HTTP_CLIENT
+        )
+        self.async_client = AsyncOpenAI(
+            base_url=self.base_url,
+            api_key=self.api_key,
+            http_client=_SHARED_ASYNC_HTTP_CLIENT
         )
-        logger.info(f"Initialized OpenAI provider with model: {self.model}")
+        self.batcher = BatchingAnalyzer(self.async_client)
+        logger.info("Initialized OpenAI provider with model: %s", self.model)
     
     def analyze_logs(self, logs: str, query: str) -> str:
         """Analyze logs using OpenAI API."""
-        logger.info(f"Analyzing logs with OpenAI model {self.model}")
+        try:
+            return "".join(self._stream(logs, query))
+        except Exception as e:
+            # Return only the error; text streamed before the failure is incomplete
+            logger.exception("Error analyzing logs with OpenAI: %s", e)
+            return f"Error analyzing logs with OpenAI: {str(e)}"
+    
+    def stream_logs(self, logs: str, query: str) -> Iterator[str]:
+        """Analyze logs using OpenAI API, yielding tokens as they arrive."""
+        try:
+            yield from self._stream(logs, query)
+        except Exception as e:
+            logger.exception("Error analyzing logs with OpenAI: %s", e)
+            yield f"Error analyzing logs with OpenAI: {str(e)}"
+    
+    def _stream(self, logs: str, query: str) -> Iterator[str]:
+        """Yield the analysis from the OpenAI API, raising if the request fails."""
+        logger.info("Analyzing logs with OpenAI model %s", self.model)
+        prompt = self._create_prompt(logs, query)
+        
+        # Log progress
+        logger.info("Sending request to OpenAI API")
+        
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True
+        )
+        yield from _iter_completion_text(response)
+        
+        logger.info("Successfully generated analysis with OpenAI")
+    
+    async def aanalyze_logs(self, logs: str, query: str) -> str:
+        """Analyze logs using the async OpenAI client, batched with concurrent requests."""
+        logger.info("Analyzing logs with OpenAI model %s", self.model)
         try:
             prompt = self._create_prompt(logs, query)
             
             # Log progress
             logger.info("Sending request to OpenAI API")
             
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}]
-            )
+            response = await self.batcher.submit(self.model, prompt)
             
             logger.info("Successfully generated analysis with OpenAI")
             return response.choices[0].message.content
         except Exception as e:
-            logger.exception(f"Error analyzing logs with OpenAI: {e}")
+            logger.exception("Error analyzing logs with OpenAI: %s", e)
             return f"Error analyzing logs with OpenAI: {str(e)}"
     
-    def _create_prompt(self, logs: str, query: str) -> str:
-        """Create a prompt for the OpenAI model."""
-        return f"""You are an expert in Azure DevOps build and release pipelines. 
-        I'll provide you with build or release logs, and I need your help to understand what went wrong.
-
-        Please analyze these logs carefully and provide:
-        1. A clear explanation of what the error is
-        2. The most likely cause of the failure
-        3. Specific steps to fix the issue
-
-        Here's the specific question: {query}
-
-        Here are the logs:
-        {logs[:80000]}  # Trimming logs to fit context window
-        """
+    async def warmup(self) -> None:
+        """Open the TLS session to the OpenAI API while other work is in flight."""
+        await _open_connection(self.base_url)
 
 class OpenRouterProvider(AIProvider):
     """OpenRouter implementation."""
@@ -82,57 +269,86 @@ class OpenRouterProvider(AIProvider):
         self.base_url = base_url or OPENROUTER_BASE_URL
         self.model = model or "openai/gpt-4-turbo"  # Default model
         
-        http_client = httpx.Client(verify=False)
+        default_headers = {
+            "HTTP-Referer": "https://azuredevopsagent.app",
+            "X-Title": "Azure DevOps Log Analyzer"
+        }
         self.client = OpenAI(
             base_url=self.base_url,
             api_key=self.api_key,
-            http_client=http_client,
-            default_headers={
-                "HTTP-Referer": "https://azuredevopsagent.app",
-                "X-Title": "Azure DevOps Log Analyzer"
-            }
+            http_client=_SHARED_HTTP_CLIENT,
+            default_headers=default_headers
         )
-        logger.info(f"Initialized OpenRouter provider with model: {self.model}")
+        self.async_client = AsyncOpenAI(
+            base_url=self.base_url,
+            api_key=self.api_key,
+            http_client=_SHARED_ASYNC_HTTP_CLIENT,
+            default_headers=default_headers
+        )
+        self.batcher = BatchingAnalyzer(self.async_client)
+        logger.info("Initialized OpenRouter provider with model: %s", self.model)
     
     def analyze_logs(self, logs: str, query: str) -> str:
         """Analyze logs using OpenRouter API."""
-        logger.info(f"Analyzing logs with OpenRouter model {self.model}")
+        try:
+            return "".join(self._stream(logs, query))
+        except Exception as e:
+            # Return only the error; text streamed before the failure is incomplete
+            logger.exception("Error analyzing logs with OpenRouter: %s", e)
+            return f"Error analyzing logs with OpenRouter: {str(e)}"
+    
+    def stream_logs(self, logs: str, query: str) -> Iterator[str]:
+        """Analyze logs using OpenRouter API, yielding tokens as they arrive."""
+        try:
+            yield from self._stream(logs, query)
+        except Exception as e:
+            logger.exception("Error analyzing logs with OpenRouter: %s", e)
+            yield f"Error analyzing logs with OpenRouter: {str(e)}"
+    
+    def _stream(self, logs: str, query: str) -> Iterator[str]:
+        """Yield the analysis from the OpenRouter API, raising if the request fails."""
+        logger.info("Analyzing logs with OpenRouter model %s", self.model)
+        prompt = self._create_prompt(logs, query)
+        
+        # Log progress
+        logger.info("Sending request to OpenRouter API")
+        
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True
+        )
+        yield from _iter_completion_text(response)
+        
+        logger.info("Successfully generated analysis with OpenRouter")
+    
+    async def aanalyze_logs(self, logs: str, query: str) -> str:
+        """Analyze logs using the async OpenRouter client, batched with concurrent requests."""
+        logger.info("Analyzing logs with OpenRouter model %s", self.model)
         try:
             prompt = self._create_prompt(logs, query)
             
             # Log progress
             logger.info("Sending request to OpenRouter API")
             
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}]
-            )
+            response = await self.batcher.submit(self.model, prompt)
             
             logger.info("Successfully generated analysis with OpenRouter")
             return response.choices[0].message.content
         except Exception as e:
-            logger.exception(f"Error analyzing logs with OpenRouter: {e}")
+            logger.exception("Error analyzing logs with OpenRouter: %s", e)
             return f"Error analyzing logs with OpenRouter: {str(e)}"
     
-    def _create_prompt(self, logs: str, query: str) -> str:
-        """Create a prompt for the OpenRouter model."""
-        return f"""You are an expert in Azure DevOps build and release pipelines. 
-        I'll provide you with build or release logs, and I need your help to understand what went wrong.
-
-        Please analyze these logs carefully and provide:
-        1. A clear explanation of what the error is
-        2. The most likely cause of the failure
-        3. Specific steps to fix the issue
-
-        Here's the specific question: {query}
-
-        Here are the logs:
-        {logs[:80000]}  # Trimming logs to fit context window
-        """
+    async def warmup(self) -> None:
+        """Open the TLS session to the OpenRouter API while other work is in flight."""
+        await _open_connection(self.base_url)
 
 class GeminiProvider(AIProvider):
     """Google Gemini AI implementation."""
     
+    # Gemini may have a smaller context window
+    max_context_chars = 50000
+    
     def __init__(self, api_key: str = None, model: str = None):
         """Initialize Gemini client."""
         self.api_key = api_key or GEMINI_API_KEY
@@ -143,44 +359,59 @@ class GeminiProvider(AIProvider):
         
         # Initialize the model
         self.gemini_model = genai.GenerativeModel(self.model)
-        logger.info(f"Initialized Gemini provider with model: {self.model}")
+        logger.info("Initialized Gemini provider with model: %s", self.model)
     
     def analyze_logs(self, logs: str, query: str) -> str:
         """Analyze logs using Gemini API."""
-        logger.info(f"Analyzing logs with Gemini model {self.model}")
+        try:
+            return "".join(self._stream(logs, query))
+        except Exception as e:
+            # Return only the error; text streamed before the failure is incomplete
+            logger.exception("Error analyzing logs with Gemini: %s", e)
+            return f"Error analyzing logs with Gemini: {str(e)}"
+    
+    def stream_logs(self, logs: str, query: str) -> Iterator[str]:
+        """Analyze logs using Gemini API, yielding text as it is generated."""
+        try:
+            yield from self._stream(logs, query)
+        except Exception as e:
+            logger.exception("Error analyzing logs with Gemini: %s", e)
+            yield f"Error analyzing logs with Gemini: {str(e)}"
+    
+    def _stream(self, logs: str, query: str) -> Iterator[str]:
+        """Yield the analysis from the Gemini API, raising if the request fails."""
+        logger.info("Analyzing logs with Gemini model %s", self.model)
+        prompt = self._create_prompt(logs, query)
+        
+        # Log progress
+        logger.info("Sending request to Gemini API")
+        
+        response = self.gemini_model.generate_content(prompt, stream=True)
+        for chunk in response:
+            yield chunk.text
+        
+        logger.info("Successfully generated analysis with Gemini")
+    
+    async def aanalyze_logs(self, logs: str, query: str) -> str:
+        """Analyze logs using the async Gemini API."""
+        logger.info("Analyzing logs with Gemini model %s", self.model)
         try:
             prompt = self._create_prompt(logs, query)
             
             # Log progress
             logger.info("Sending request to Gemini API")
             
-            response = self.gemini_model.generate_content(prompt)
+            response = await _run_on_shared_loop(self.gemini_model.generate_content_async(prompt))
             
             logger.info("Successfully generated analysis with Gemini")
             return response.text
         except Exception as e:
-            logger.exception(f"Error analyzing logs with Gemini: {e}")
+            logger.exception("Error analyzing logs with Gemini: %s", e)
             return f"Error analyzing logs with Gemini: {str(e)}"
-    
-    def _create_prompt(self, logs: str, query: str) -> str:
-        """Create a prompt for the Gemini model."""
-        return f"""You are an expert in Azure DevOps build and release pipelines. 
-        I'll provide you with build or release logs, and I need your help to understand what went wrong.
-
-        Please analyze these logs carefully and provide:
-        1. A clear explanation of what the error is
-        2. The most likely cause of the failure
-        3. Specific steps to fix the issue
-
-        Here's the specific question: {query}
-
-        Here are the logs:
-        {logs[:50000]}  # Gemini may have a smaller context window
-        """
 
 def get_ai_provider(provider_name: str = "openai", model: Optional[str] = None) -> AIProvider:
     """Factory function to get the appropriate AI provider."""
-    logger.info(f"Creating AI provider for: {provider_name}")
+    logger.info("Creating AI provider for: %s", provider_name)
     
     if provider_name == "openai":
         return OpenAIProvider(model=model)
@@ -189,5 +420,14 @@ def get_ai_provider(provider_name: str = "openai", model: Optional[str] = None)
     elif provider_name == "gemini":
         return GeminiProvider(model=model)
     else:
-        logger.warning(f"Unknown provider '{provider_name}', falling back to OpenAI")
-        return OpenAIProvider(model=model) 
\ No newline at end of file
+        logger.warning("Unknown provider '%s', falling back to OpenAI", provider_name)
+        return OpenAIProvider(model=model)
+
+@functools.lru_cache(maxsize=16)
+def get_cached_ai_provider(provider_name: str = "openai", model: Optional[str] = None) -> AIProvider:
+    """Return a provider shared across the process, creating it on first use.
+    
+    Providers own API clients and their connection pools, so switching back to a
+    (provider, model) pair seen before reuses the existing instance.
+    """
+    return get_ai_provider(provider_name, model) 
\ No newline at end of file
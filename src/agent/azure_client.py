@@ -1,55 +1,141 @@
-import re
 import base64
+import asyncio
+import functools
 import logging
+import threading
+import weakref
+import httpx
+import orjson
 import requests
-from typing import Dict
+from cachetools import TTLCache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+from src.config.settings import (
+    AZDO_CONNECT_TIMEOUT, AZDO_READ_TIMEOUT,
+    LOG_CACHE_SIZE, LOG_CACHE_TTL
+)
 
 logger = logging.getLogger(__name__)
 
+# Build logs are joined with this marker between sections
+_LOG_SEPARATOR = b"\n\n===== LOG SECTION =====\n\n"
+# Analysis only uses the end of the logs; keep at most this many chars of them
+# (buffered as 4 bytes per char, the UTF-8 worst case)
+_DEFAULT_MAX_CHARS = 80_000
+_BYTES_PER_CHAR = 4
+_CHUNK_SIZE = 65536
+# get_build_logs results starting with one of these are errors and never cached
+_FAILURE_PREFIXES = ("Could not", "Failed", "No logs", "Error")
+
+
+def _keep_tail(buf: bytearray, max_bytes: int) -> None:
+    """Trim buf in place to its last max_bytes bytes, starting at a line boundary if possible."""
+    if len(buf) <= max_bytes:
+        return
+    del buf[:len(buf) - max_bytes]
+    newline = buf.find(b"\n")
+    if newline != -1:
+        del buf[:newline + 1]
+
+
+def _drop_partial_line(text: str) -> str:
+    """Drop the cut-off first line of a trimmed log, unless it is the only one."""
+    newline = text.find("\n")
+    return text[newline + 1:] if newline != -1 else text
+
+
 class AzureDevOpsClient:
     def __init__(self, pat: str, organization: str):
         self.pat = pat
         self.organization = organization
-        self.headers = {"Authorization": f"Basic {self._encode_pat(pat)}"}
-        logger.info(f"Initialized Azure DevOps client for organization: {organization}")
+        self._auth_header = f"Basic {self._encode_pat(pat)}"
+        self.headers = {"Authorization": self._auth_header}
+
+        # Logs of recently fetched finished builds, keyed by _log_cache_key, as
+        # (max_chars they were fetched with, logs)
+        self._log_cache = TTLCache(maxsize=LOG_CACHE_SIZE, ttl=LOG_CACHE_TTL)
+        self._log_cache_lock = threading.Lock()
+        logger.info("Initialized Azure DevOps client for organization: %s", organization)
+
+    @functools.cached_property
+    def _session(self) -> requests.Session:
+        """Pooled session reused across all API calls made by this client.
+
+        Created on first use, so a client built before a pre-forking server forks
+        (e.g. gunicorn's preload_app) never shares sockets between workers.
+        """
+        session = requests.Session()
+        session.headers.update(self.headers)
+        adapter = HTTPAdapter(
+            pool_connections=16,
+            pool_maxsize=32,
+            max_retries=Retry(
+                total=2,
+                backoff_factor=0.3,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=("GET",)
+            )
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        # Close the pool when the client is collected or the interpreter exits
+        weakref.finalize(self, session.close)
+        return session
+
+    def close(self) -> None:
+        """Close the underlying HTTP session and release pooled connections."""
+        session = self.__dict__.pop("_session", None)
+        if session is not None:
+            session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
-    def _encode_pat(self, pat: str) -> str:
+    @staticmethod
+    @functools.lru_cache(maxsize=8)
+    def _encode_pat(pat: str) -> str:
         return base64.b64encode(f":{pat}".encode()).decode()
 
     def parse_azure_devops_url(self, url: str) -> Dict:
         """Parse Azure DevOps/TFS URL to extract relevant information."""
-        logger.info(f"Parsing URL: {url}")
+        logger.info("Parsing URL: %s", url)
+
+        split_url = urlsplit(url)
+        params = parse_qs(split_url.query)
 
         # Extract build ID
-        build_id_match = re.search(r'buildId=(\d+)', url)
-        if not build_id_match:
+        build_id = params.get("buildId", [None])[0]
+        if not build_id or not build_id.isdigit():
             logger.warning("Could not extract build ID from URL")
             return {}
 
-        build_id = build_id_match.group(1)
-
         # Determine if it's a TFS or Azure DevOps URL
-        if "tfs" in url.lower():
-            base_url_match = re.search(r'(https?://[^/]+/tfs/[^/]+)', url)
-            base_url = base_url_match.group(1) if base_url_match else None
-
-            # Extract project name
-            project_match = re.search(r'tfs/[^/]+/([^/]+)', url)
-            project = project_match.group(1) if project_match else None
-        else:
-            base_url_match = re.search(r'(https?://dev\.azure\.com/[^/]+)', url)
-            base_url = base_url_match.group(1) if base_url_match else None
-
-            # Extract project name
-            project_match = re.search(r'azure\.com/[^/]+/([^/]+)', url)
-            project = project_match.group(1) if project_match else None
+        segments = split_url.path.split("/")
+        base_url = None
+        project = None
+        if "tfs" in segments:
+            # https://<server>/tfs/<collection>/<project>/...
+            index = segments.index("tfs")
+            if len(segments) > index + 1 and segments[index + 1]:
+                base_url = f"{split_url.scheme}://{split_url.netloc}/tfs/{segments[index + 1]}"
+            if len(segments) > index + 2 and segments[index + 2]:
+                project = segments[index + 2]
+        elif split_url.netloc.lower().endswith("azure.com"):
+            # https://dev.azure.com/<organization>/<project>/...
+            organization = segments[1] if len(segments) > 1 and segments[1] else None
+            if organization and split_url.netloc.lower() == "dev.azure.com":
+                base_url = f"{split_url.scheme}://{split_url.netloc}/{organization}"
+            if organization and len(segments) > 2 and segments[2]:
+                project = segments[2]
 
         # Extract job and task IDs if present
-        job_id_match = re.search(r'j=([^&]+)', url)
-        job_id = job_id_match.group(1) if job_id_match else None
-
-        task_id_match = re.search(r't=([^&]+)', url)
-        task_id = task_id_match.group(1) if task_id_match else None
+        job_id = params.get("j", [None])[0]
+        task_id = params.get("t", [None])[0]
 
         result = {
             "type": "build",
@@ -63,75 +149,227 @@ class AzureDevOpsClient:
         if task_id:
             result["task_id"] = task_id
 
-        logger.info(f"Parsed URL data: {result}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Parsed URL data: %s", result)
         return result
 
-    def get_build_logs(self, url_info: Dict) -> str:
-        """Get build logs from Azure DevOps/TFS based on parsed URL info."""
-        logger.info(f"Getting build logs for: {url_info}")
+    def get_build_logs(self, url_info: Dict, force_refresh: bool = False,
+                       max_chars: int = _DEFAULT_MAX_CHARS) -> str:
+        """Get build logs from Azure DevOps/TFS based on parsed URL info.
+
+        At most max_chars characters are returned. Build failures show up at the
+        end of a log, so each log is streamed in full but only its last max_chars
+        characters are kept, and once the join is over budget the end of the
+        last logs wins. Logs of completed builds are cached (LOG_CACHE_TTL) so
+        follow-up questions about the same build skip the fetch, also with a
+        smaller max_chars; pass force_refresh=True to bypass the cache.
+        """
+        logger.info("Getting build logs for: %s", url_info)
 
         if not url_info or "build_id" not in url_info:
             return "Could not parse build information from URL."
 
+        logs = None if force_refresh else self._get_cached_logs(url_info, max_chars)
+        if logs is None:
+            logs, completed = self._fetch_build_logs(url_info, max_chars)
+            if completed:
+                self._cache_logs(url_info, max_chars, logs)
+        return logs
+
+    async def aget_build_logs(self, url_info: Dict, force_refresh: bool = False,
+                              max_chars: int = _DEFAULT_MAX_CHARS) -> str:
+        """Async variant of get_build_logs; all requests share one httpx.AsyncClient."""
+        logger.info("Getting build logs for: %s", url_info)
+
+        if not url_info or "build_id" not in url_info:
+            return "Could not parse build information from URL."
+
+        logs = None if force_refresh else self._get_cached_logs(url_info, max_chars)
+        if logs is None:
+            logs, completed = await self._afetch_build_logs(url_info, max_chars)
+            if completed:
+                self._cache_logs(url_info, max_chars, logs)
+        return logs
+
+    def _log_cache_key(self, url_info: Dict) -> tuple:
+        """Identify a build by collection/organization URL, project and build ID."""
+        return (url_info.get("base_url"), url_info.get("project"), url_info["build_id"])
+
+    def _get_cached_logs(self, url_info: Dict, max_chars: int) -> Optional[str]:
+        """Return the end of the cached logs for the build, or None if none cover max_chars."""
+        with self._log_cache_lock:
+            entry = self._log_cache.get(self._log_cache_key(url_info))
+        if entry is None or entry[0] < max_chars:
+            return None
+        logger.info("Using cached logs for build %s", url_info['build_id'])
+        logs = entry[1]
+        return logs if len(logs) <= max_chars else _drop_partial_line(logs[-max_chars:])
+
+    def _cache_logs(self, url_info: Dict, max_chars: int, logs: str) -> None:
+        """Cache successfully fetched logs; error messages are never cached."""
+        if logs.startswith(_FAILURE_PREFIXES):
+            return
+        with self._log_cache_lock:
+            self._log_cache[self._log_cache_key(url_info)] = (max_chars, logs)
+
+    def _api_base(self, url_info: Dict) -> str:
+        """Build the REST API root for the project in url_info."""
+        project = url_info["project"]
+        base_url = url_info["base_url"]
+
+        # Determine API endpoint based on whether it's TFS or Azure DevOps
+        if "tfs" in base_url.lower():
+            # For TFS, include the project in the path
+            return f"{base_url}/{project}/_apis"
+        return f"{base_url}/{project}/_apis"
+
+    def _select_log_ids(self, url_info: Dict, logs_data: Dict) -> List[int]:
+        """Pick the log IDs to download from a build's log list."""
+        # If job_id and task_id are specified, get those specific logs
+        if "job_id" in url_info and "task_id" in url_info:
+            # This is more complex and depends on the specific API structure
+            # For simplicity, we'll get all logs for now
+            pass
+
+        return [log.get("id") for log in logs_data.get("value", []) if log.get("id")]
+
+    def _join_logs(self, all_logs: List[bytearray], max_chars: int) -> str:
+        """Join raw log bodies and decode once, keeping the end if they exceed max_chars."""
+        if not all_logs:
+            return "No logs found for this build."
+
+        max_bytes = max_chars * _BYTES_PER_CHAR
+        buf = bytearray()
+        for content in all_logs:
+            if buf:
+                buf.extend(_LOG_SEPARATOR)
+            buf.extend(content)
+            if len(buf) > 2 * max_bytes:
+                _keep_tail(buf, max_bytes)
+        _keep_tail(buf, max_bytes)
+        text = buf.decode("utf-8", errors="replace")
+        return text if len(text) <= max_chars else _drop_partial_line(text[-max_chars:])
+
+    def _fetch_build_logs(self, url_info: Dict, max_chars: int = _DEFAULT_MAX_CHARS) -> Tuple[str, bool]:
+        """Fetch build logs from the Azure DevOps/TFS REST API.
+
+        Returns the logs (or an error message) and whether the build has completed,
+        i.e. whether its logs can no longer change.
+        """
         try:
             build_id = url_info["build_id"]
-            project = url_info["project"]
-            base_url = url_info["base_url"]
-
-            # Determine API endpoint based on whether it's TFS or Azure DevOps
-            if "tfs" in base_url.lower():
-                # For TFS, include the project in the path
-                api_base = f"{base_url}/{project}/_apis"
-            else:
-                api_base = f"{base_url}/{project}/_apis"
+            api_base = self._api_base(url_info)
 
             # First, get the build details
             build_url = f"{api_base}/build/builds/{build_id}?api-version=6.0"
-            logger.info(f"Requesting build details from: {build_url}")
+            logger.info("Requesting build details from: %s", build_url)
 
-            response = requests.get(build_url, headers=self.headers)
+            response = self._session.get(build_url, timeout=(AZDO_CONNECT_TIMEOUT, AZDO_READ_TIMEOUT))
             if response.status_code != 200:
-                logger.error(f"Failed to get build details: {response.status_code} - {response.text}")
-                return f"Failed to get build details: {response.status_code}"
+                logger.error("Failed to get build details: %s - %s", response.status_code, response.text)
+                return f"Failed to get build details: {response.status_code}", False
 
-            build_data = response.json()
+            completed = orjson.loads(response.content).get("status") == "completed"
 
             # Get logs URL
             logs_url = f"{api_base}/build/builds/{build_id}/logs?api-version=6.0"
-            logger.info(f"Requesting log list from: {logs_url}")
+            logger.info("Requesting log list from: %s", logs_url)
 
-            response = requests.get(logs_url, headers=self.headers)
+            response = self._session.get(logs_url, timeout=(AZDO_CONNECT_TIMEOUT, AZDO_READ_TIMEOUT))
             if response.status_code != 200:
-                logger.error(f"Failed to get logs list: {response.status_code} - {response.text}")
-                return f"Failed to get logs list: {response.status_code}"
+                logger.error("Failed to get logs list: %s - %s", response.status_code, response.text)
+                return f"Failed to get logs list: {response.status_code}", False
 
-            logs_data = response.json()
+            log_ids = self._select_log_ids(url_info, orjson.loads(response.content))
 
-            # If job_id and task_id are specified, get those specific logs
-            if "job_id" in url_info and "task_id" in url_info:
-                # This is more complex and depends on the specific API structure
-                # For simplicity, we'll get all logs for now
-                pass
+            # Get all logs concurrently, preserving the order of the log list
+            max_bytes = max_chars * _BYTES_PER_CHAR
+            all_logs = asyncio.run(self._fetch_logs_async(api_base, build_id, log_ids, max_bytes))
+            return self._join_logs(all_logs, max_chars), completed
 
-            # Get all logs
-            all_logs = []
-            for log in logs_data.get("value", []):
-                log_id = log.get("id")
-                if log_id:
-                    log_url = f"{api_base}/build/builds/{build_id}/logs/{log_id}?api-version=6.0"
-                    logger.info(f"Requesting log content from: {log_url}")
+        except Exception as e:
+            logger.exception("Error retrieving build logs: %s", e)
+            return f"Error retrieving build logs: {str(e)}", False
 
-                    log_response = requests.get(log_url, headers=self.headers)
-                    if log_response.status_code == 200:
-                        all_logs.append(log_response.text)
-                    else:
-                        logger.warning(f"Failed to get log {log_id}: {log_response.status_code}")
+    async def _afetch_build_logs(self, url_info: Dict, max_chars: int = _DEFAULT_MAX_CHARS) -> Tuple[str, bool]:
+        """Like _fetch_build_logs, without blocking the event loop."""
+        try:
+            build_id = url_info["build_id"]
+            api_base = self._api_base(url_info)
+
+            async with self._make_async_client() as client:
+                # First, get the build details
+                build_url = f"{api_base}/build/builds/{build_id}?api-version=6.0"
+                logger.info("Requesting build details from: %s", build_url)
 
-            if not all_logs:
-                return "No logs found for this build."
+                response = await client.get(build_url)
+                if response.status_code != 200:
+                    logger.error("Failed to get build details: %s - %s", response.status_code, response.text)
+                    return f"Failed to get build details: {response.status_code}", False
+                completed = orjson.loads(response.content).get("status") == "completed"
 
-            return "\n\n===== LOG SECTION =====\n\n".join(all_logs)
+                # Get logs URL
+                logs_url = f"{api_base}/build/builds/{build_id}/logs?api-version=6.0"
+                logger.info("Requesting log list from: %s", logs_url)
+
+                response = await client.get(logs_url)
+                if response.status_code != 200:
+                    logger.error("Failed to get logs list: %s - %s", response.status_code, response.text)
+                    return f"Failed to get logs list: {response.status_code}", False
+
+                log_ids = self._select_log_ids(url_info, orjson.loads(response.content))
+                max_bytes = max_chars * _BYTES_PER_CHAR
+                all_logs = await self._fetch_logs_async(api_base, build_id, log_ids, max_bytes, client)
+            return self._join_logs(all_logs, max_chars), completed
 
         except Exception as e:
-            logger.exception(f"Error retrieving build logs: {e}")
-            return f"Error retrieving build logs: {str(e)}" 
\ No newline at end of file
+            logger.exception("Error retrieving build logs: %s", e)
+            return f"Error retrieving build logs: {str(e)}", False
+
+    def _make_async_client(self) -> httpx.AsyncClient:
+        """Create the keep-alive async client used for Azure DevOps API requests."""
+        return httpx.AsyncClient(
+            headers=self.headers,
+            limits=httpx.Limits(max_connections=16, max_keepalive_connections=16),
+            timeout=httpx.Timeout(AZDO_READ_TIMEOUT, connect=AZDO_CONNECT_TIMEOUT)
+        )
+
+    async def _fetch_logs_async(self, api_base: str, build_id: int, log_ids: List[int], max_bytes: int,
+                                client: Optional[httpx.AsyncClient] = None) -> List[bytearray]:
+        """Fetch the content of several build logs concurrently over one connection pool."""
+        if client is None:
+            async with self._make_async_client() as client:
+                return await self._fetch_logs_async(api_base, build_id, log_ids, max_bytes, client)
+
+        log_urls = [f"{api_base}/build/builds/{build_id}/logs/{log_id}?api-version=6.0" for log_id in log_ids]
+        results = await asyncio.gather(
+            *(self._fetch_log_async(client, log_id, log_url, max_bytes) for log_id, log_url in zip(log_ids, log_urls)),
+            return_exceptions=True
+        )
+
+        all_logs = []
+        for log_id, content in zip(log_ids, results):
+            if isinstance(content, Exception):
+                logger.warning("Failed to get log %s: %s", log_id, content)
+            elif content is not None:
+                all_logs.append(content)
+        return all_logs
+
+    async def _fetch_log_async(self, client: httpx.AsyncClient, log_id: int, log_url: str,
+                               max_bytes: int) -> Optional[bytearray]:
+        """Stream a single log body, keeping only its last max_bytes bytes."""
+        logger.info("Requesting log content from: %s", log_url)
+        async with client.stream("GET", log_url) as log_response:
+            if log_response.status_code != 200:
+                logger.warning("Failed to get log %s: %s", log_id, log_response.status_code)
+                return None
+
+            # Failures are at the end of the log, so read it all but hold at most
+            # about two windows in memory
+            content = bytearray()
+            async for chunk in log_response.aiter_bytes(_CHUNK_SIZE):
+                content.extend(chunk)
+                if len(content) > 2 * max_bytes:
+                    _keep_tail(content, max_bytes)
+            _keep_tail(content, max_bytes)
+            return content
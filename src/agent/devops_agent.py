@@ -1,15 +1,37 @@
 import re
+import copy
+import asyncio
+import hashlib
 import logging
-from typing import Optional
+import threading
+from cachetools import TTLCache
+from typing import Dict, Iterator, Optional, Tuple
 from src.agent.azure_client import AzureDevOpsClient
 from src.agent.ai_agent import AIAnalysisAgent
 from src.config.settings import (
     AZURE_DEVOPS_PAT, AZURE_DEVOPS_ORG, 
-    AI_API_KEY, DEFAULT_AI_PROVIDER
+    AI_API_KEY, DEFAULT_AI_PROVIDER,
+    ANALYSIS_CACHE_SIZE, ANALYSIS_CACHE_TTL
 )
 
 logger = logging.getLogger(__name__)
 
+# Build URLs may appear in a message as a full URL with an optional @ prefix, a
+# domain without protocol, a partial TFS path or just the build ID. The patterns
+# are tried in this order, so a full URL wins over a fragment earlier in the text.
+_URL_PATTERNS = tuple(re.compile(pattern) for pattern in (
+    r"(?:^|\s)@?(https?://\S+)",
+    r"(?:^|\s)(azure\.asax\.ir\S+)",
+    r"(?:^|\s)(tfs/\S+)",
+    r"buildId=(\d+)",
+))
+
+# Question asked when the user doesn't provide one
+_DEFAULT_QUERY = "What caused this build to fail and how can I fix it?"
+
+class _RequestError(Exception):
+    """Raised while preparing a request; the message is returned to the user."""
+
 class DevOpsAgent:
     def __init__(self):
         # Configuration
@@ -24,50 +46,173 @@ class DevOpsAgent:
             api_key=AI_API_KEY,
             provider=DEFAULT_AI_PROVIDER
         )
+        
+        # Completed analyses, keyed by _analysis_key
+        self._analysis_cache = TTLCache(maxsize=ANALYSIS_CACHE_SIZE, ttl=ANALYSIS_CACHE_TTL)
+        self._analysis_cache_lock = threading.Lock()
         logger.info("DevOpsAgent initialization complete")
 
     def process_request(self, text: str, user_id: str, provider: Optional[str] = None, model: Optional[str] = None) -> str:
         """Process a user request containing an Azure DevOps URL and question."""
+        try:
+            url_info, query, force_refresh, ai_agent = self._prepare_request(text, user_id, provider, model)
+        except _RequestError as e:
+            return str(e)
+        return self._run(url_info, query, force_refresh, ai_agent)
+
+    def process_parsed(self, url: str, query: str, user_id: str, provider: Optional[str] = None,
+                       model: Optional[str] = None) -> str:
+        """Process a request whose URL and question are already separate, skipping URL extraction."""
+        try:
+            url_info, query, force_refresh, ai_agent = self._prepare_parsed(url, query, user_id, provider, model)
+        except _RequestError as e:
+            return str(e)
+        return self._run(url_info, query, force_refresh, ai_agent)
+
+    def stream_request(self, text: str, user_id: str, provider: Optional[str] = None, model: Optional[str] = None) -> Iterator[str]:
+        """Process a request like process_request, yielding the analysis as it is generated."""
+        try:
+            url_info, query, force_refresh, ai_agent = self._prepare_request(text, user_id, provider, model)
+        except _RequestError as e:
+            yield str(e)
+            return
+        yield from self._stream(url_info, query, force_refresh, ai_agent)
+
+    def stream_parsed(self, url: str, query: str, user_id: str, provider: Optional[str] = None,
+                      model: Optional[str] = None) -> Iterator[str]:
+        """Like process_parsed, yielding the analysis as it is generated."""
+        try:
+            url_info, query, force_refresh, ai_agent = self._prepare_parsed(url, query, user_id, provider, model)
+        except _RequestError as e:
+            yield str(e)
+            return
+        yield from self._stream(url_info, query, force_refresh, ai_agent)
+
+    async def aprocess_request(self, text: str, user_id: str, provider: Optional[str] = None, model: Optional[str] = None) -> str:
+        """Async variant of process_request for use from async request handlers."""
+        try:
+            url_info, query, force_refresh, ai_agent = self._prepare_request(text, user_id, provider, model)
+        except _RequestError as e:
+            return str(e)
+        return await self._arun(url_info, query, force_refresh, ai_agent)
+
+    async def aprocess_parsed(self, url: str, query: str, user_id: str, provider: Optional[str] = None,
+                              model: Optional[str] = None) -> str:
+        """Async variant of process_parsed for use from async request handlers."""
+        try:
+            url_info, query, force_refresh, ai_agent = self._prepare_parsed(url, query, user_id, provider, model)
+        except _RequestError as e:
+            return str(e)
+        return await self._arun(url_info, query, force_refresh, ai_agent)
+
+    def _run(self, url_info: Dict, query: str, force_refresh: bool, ai_agent: AIAnalysisAgent) -> str:
+        """Fetch the build logs and analyze them with ai_agent, using cached results where possible."""
+        # Get logs
+        logger.info(f"Retrieving logs for build ID: {url_info.get('build_id', 'unknown')}")
+        logs = self.azure_client.get_build_logs(
+            url_info, force_refresh=force_refresh, max_chars=ai_agent.log_window_chars
+        )
+        error = self._check_logs(logs)
+        if error:
+            return error
+
+        key = self._analysis_key(logs, query, ai_agent)
+        analysis = None if force_refresh else self._get_cached_analysis(key)
+        if analysis is not None:
+            return analysis
+
+        # Analyze logs
+        logger.info(f"Starting log analysis with provider {ai_agent.provider_name}")
+        analysis = ai_agent.analyze_logs(logs, query)
+        logger.info("Analysis complete")
+
+        self._cache_analysis(key, analysis)
+        return analysis
+
+    def _stream(self, url_info: Dict, query: str, force_refresh: bool, ai_agent: AIAnalysisAgent) -> Iterator[str]:
+        """Like _run, yielding the analysis as it is generated."""
+        # Get logs
+        logger.info(f"Retrieving logs for build ID: {url_info.get('build_id', 'unknown')}")
+        logs = self.azure_client.get_build_logs(
+            url_info, force_refresh=force_refresh, max_chars=ai_agent.log_window_chars
+        )
+        error = self._check_logs(logs)
+        if error:
+            yield error
+            return
+
+        key = self._analysis_key(logs, query, ai_agent)
+        analysis = None if force_refresh else self._get_cached_analysis(key)
+        if analysis is not None:
+            yield analysis
+            return
+
+        # Analyze logs
+        logger.info(f"Starting streamed log analysis with provider {ai_agent.provider_name}")
+        chunks = []
+        failed = False
+        for chunk in ai_agent.stream_logs(logs, query):
+            # A failing stream ends with the error message after any partial text
+            failed = chunk.startswith("Error analyzing logs")
+            chunks.append(chunk)
+            yield chunk
+        logger.info("Analysis complete")
+
+        if not failed:
+            self._cache_analysis(key, "".join(chunks))
+
+    async def _arun(self, url_info: Dict, query: str, force_refresh: bool, ai_agent: AIAnalysisAgent) -> str:
+        """Async variant of _run."""
+        # Get logs, warming up the AI provider connection while they download
+        logger.info(f"Retrieving logs for build ID: {url_info.get('build_id', 'unknown')}")
+        log_task = asyncio.create_task(self.azure_client.aget_build_logs(
+            url_info, force_refresh=force_refresh, max_chars=ai_agent.log_window_chars
+        ))
+        warm_task = asyncio.create_task(ai_agent.warmup())
+        logs = await log_task
+        error = self._check_logs(logs)
+        if error:
+            warm_task.cancel()
+            return error
+
+        key = self._analysis_key(logs, query, ai_agent)
+        analysis = None if force_refresh else self._get_cached_analysis(key)
+        if analysis is not None:
+            warm_task.cancel()
+            return analysis
+        await warm_task
+
+        # Analyze logs
+        logger.info(f"Starting log analysis with provider {ai_agent.provider_name}")
+        analysis = await ai_agent.aanalyze_logs(logs, query)
+        logger.info("Analysis complete")
+
+        self._cache_analysis(key, analysis)
+        return analysis
+
+    def _prepare_request(self, text: str, user_id: str, provider: Optional[str],
+                         model: Optional[str]) -> Tuple[Dict, str, bool, AIAnalysisAgent]:
+        """Select the provider and extract the parsed URL, query and refresh flag from text.
+
+        Raises _RequestError with a user-facing message when the URL is missing or invalid.
+        """
         logger.info(f"Processing request from user {user_id}: {text}")
         
         # Add more detailed debugging
         logger.info(f"Text being processed for URL extraction: '{text}'")
         
-        # Change AI provider if specified
-        if provider and provider != self.ai_agent.provider_name:
-            logger.info(f"Changing AI provider from {self.ai_agent.provider_name} to {provider} with model {model}")
-            self.ai_agent.change_provider(provider, model)
-            logger.info(f"Changed AI provider to {provider} with model {model}")
+        ai_agent = self._select_provider(provider, model)
 
-        # Extract URL from the message - modified to handle URLs with @ prefix
-        # Try multiple patterns to maximize chances of finding the URL
-        url_patterns = [
-            r'(?:^|\s)@?(https?://[^\s]+)',  # Standard URL with optional @ prefix
-            r'(?:^|\s)(azure\.asax\.ir[^\s]+)',  # Domain without protocol
-            r'(?:^|\s)(tfs/[^\s]+)',  # Partial TFS path
-            r'buildId=(\d+)'  # Just the build ID
-        ]
-        
-        url_match = None
-        for pattern in url_patterns:
-            match = re.search(pattern, text)
-            if match:
-                url_match = match
-                logger.info(f"URL match found with pattern '{pattern}': {match.group(0)}")
-                break
-                
-        # More debugging for regex matching
-        if url_match:
-            logger.info(f"URL match found: '{url_match.group(0)}' -> '{url_match.group(1)}'")
-        else:
-            logger.info(f"No URL match found in text: '{text}'")
-            
+        # Extract URL from the message - handles URLs with @ prefix
+        url_match = next(filter(None, (pattern.search(text) for pattern in _URL_PATTERNS)), None)
         if not url_match:
+            logger.info(f"No URL match found in text: '{text}'")
             logger.warning("No valid Azure DevOps URL found in the message")
-            return "I couldn't find a valid Azure DevOps URL in your message. Please include the URL to the build or release you want me to analyze."
+            raise _RequestError("I couldn't find a valid Azure DevOps URL in your message. Please include the URL to the build or release you want me to analyze.")
 
         # Extract the URL based on what was matched
         url = url_match.group(1)
+        logger.info(f"URL match found: '{url_match.group(0)}' -> '{url}'")
         
         # If we matched a partial URL, try to reconstruct it
         if not url.startswith('http'):
@@ -81,30 +226,89 @@ class DevOpsAgent:
         logger.info(f"Extracted URL: {url}")
 
         # Extract question (everything after the URL)
-        query = text[len(url):].strip()
-        if not query:
-            query = "What caused this build to fail and how can I fix it?"
+        query = text[url_match.end():].strip() or _DEFAULT_QUERY
         logger.info(f"Extracted query: {query}")
 
+        url_info, force_refresh = self._parse_url(url)
+        return url_info, query, force_refresh, ai_agent
+
+    def _prepare_parsed(self, url: str, query: str, user_id: str, provider: Optional[str],
+                        model: Optional[str]) -> Tuple[Dict, str, bool, AIAnalysisAgent]:
+        """Select the provider and parse an already extracted URL.
+
+        Raises _RequestError with a user-facing message when the URL is invalid.
+        """
+        logger.info(f"Processing request from user {user_id}: {url} {query}")
+        ai_agent = self._select_provider(provider, model)
+        if not url:
+            logger.warning("No Azure DevOps URL provided")
+            raise _RequestError("I couldn't find a valid Azure DevOps URL in your message. Please include the URL to the build or release you want me to analyze.")
+        url_info, force_refresh = self._parse_url(url)
+        # JSON clients may send "query": null
+        return url_info, (query or "").strip() or _DEFAULT_QUERY, force_refresh, ai_agent
+
+    def _select_provider(self, provider: Optional[str], model: Optional[str]) -> AIAnalysisAgent:
+        """Change AI provider if one is specified and return the agent for this request.
+
+        The request keeps its own agent, so a concurrent request switching the
+        provider cannot change which provider analyzes it or whose cache key it gets.
+        """
+        ai_agent = copy.copy(self.ai_agent)
+        if provider and provider != ai_agent.provider_name:
+            logger.info(f"Changing AI provider from {ai_agent.provider_name} to {provider} with model {model}")
+            ai_agent.change_provider(provider, model)
+            # Later requests without a provider keep using this one
+            self.ai_agent = ai_agent
+            logger.info(f"Changed AI provider to {provider} with model {model}")
+        return ai_agent
+
+    def _parse_url(self, url: str) -> Tuple[Dict, bool]:
+        """Parse a build URL, returning its info and whether #refresh was requested.
+
+        Raises _RequestError with a user-facing message when the URL is invalid.
+        """
+        # A trailing #refresh on the URL bypasses the build log cache
+        url, _, fragment = url.partition("#")
+        force_refresh = fragment == "refresh"
+
         # Parse the URL
         logger.info("Parsing Azure DevOps URL")
         url_info = self.azure_client.parse_azure_devops_url(url)
         if not url_info:
             logger.warning("Failed to parse Azure DevOps URL")
-            return "I couldn't parse that Azure DevOps URL. Please make sure it's a valid build or release URL."
+            raise _RequestError("I couldn't parse that Azure DevOps URL. Please make sure it's a valid build or release URL.")
 
-        # Get logs
-        logger.info(f"Retrieving logs for build ID: {url_info.get('build_id', 'unknown')}")
-        logs = self.azure_client.get_build_logs(url_info)
-        if not logs or logs.startswith("Failed") or logs.startswith("Error"):
-            logger.error(f"Failed to retrieve logs: {logs}")
-            return f"I had trouble retrieving the logs: {logs}"
+        return url_info, force_refresh
 
-        logger.info(f"Successfully retrieved logs ({len(logs)} characters)")
-        
-        # Analyze logs
-        logger.info(f"Starting log analysis with provider {self.ai_agent.provider_name}")
-        analysis = self.ai_agent.analyze_logs(logs, query)
-        logger.info("Analysis complete")
+    def _analysis_key(self, logs: str, query: str, ai_agent: AIAnalysisAgent) -> str:
+        """Identify an analysis by its logs, question and ai_agent's provider and model."""
+        return hashlib.sha256(b"|".join([
+            hashlib.sha256(logs.encode()).digest(),
+            hashlib.sha256(query.encode()).digest(),
+            ai_agent.provider_name.encode(),
+            (ai_agent.model or "").encode()
+        ])).hexdigest()
+
+    def _get_cached_analysis(self, key: str) -> Optional[str]:
+        """Return the cached analysis for key, or None on a cache miss."""
+        with self._analysis_cache_lock:
+            analysis = self._analysis_cache.get(key)
+        logger.info("Analysis cache %s", "hit" if analysis is not None else "miss")
+        return analysis
+
+    def _cache_analysis(self, key: str, analysis: str) -> None:
+        """Cache a successful analysis; error messages are never cached."""
+        if not analysis or analysis.startswith("Error analyzing logs"):
+            return
+        with self._analysis_cache_lock:
+            self._analysis_cache[key] = analysis
+
+    def _check_logs(self, logs: str) -> Optional[str]:
+        """Return a user-facing error message if log retrieval failed."""
+        if not logs or logs.startswith(("Failed", "Error")):
+            logger.error("Failed to retrieve logs: %s", logs)
+            return f"I had trouble retrieving the logs: {logs}"
 
-        return analysis 
\ No newline at end of file
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Successfully retrieved logs (%d characters)", len(logs))
+        return None
@@ -0,0 +1,118 @@
+import queue
+import threading
+from collections import deque
+from typing import Optional
+
+import orjson
+from cachetools import TTLCache
+
+
+def sse_frame(obj) -> bytes:
+    """Encode obj as an SSE data frame."""
+    return b"data: " + orjson.dumps(obj) + b"\n\n"
+
+
+class _Channel:
+    """Subscribers and recent frames of a single session."""
+
+    __slots__ = ("history", "subscribers", "closed")
+
+    def __init__(self, history_size: int):
+        self.history = deque(maxlen=history_size)
+        self.subscribers = []
+        self.closed = False
+
+
+class EventBus:
+    """Fan out server-sent events to every subscriber of a session.
+
+    Each event is serialized once when published and the same bytes object is
+    queued for all subscribers. Recent frames are kept per session, so a client
+    that subscribes after publishing has started still sees the updates it missed.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 900, queue_size: int = 64):
+        # Abandoned sessions expire after ttl seconds
+        self._channels = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        # Bound each subscriber queue so a stalled consumer cannot make it grow without limit
+        self._queue_size = queue_size
+
+    def open(self, session_id: str) -> None:
+        """Create the channel for session_id so events published to it are kept."""
+        with self._lock:
+            channel = self._channels.get(session_id)
+            if channel is None or channel.closed:
+                self._channels[session_id] = _Channel(self._queue_size)
+
+    def is_closed(self, session_id: str) -> bool:
+        """Return True if session_id's stream has ended or its channel has expired."""
+        with self._lock:
+            channel = self._channels.get(session_id)
+            return channel is None or channel.closed
+
+    def subscribe(self, session_id: str) -> queue.Queue:
+        """Return a queue of frames for session_id, starting with the ones already published.
+
+        The queue yields None once the channel is closed. A closed channel is
+        replayed to one late subscriber only; after that the session starts over
+        and the next subscriber waits for the next run.
+        """
+        q = queue.Queue(maxsize=self._queue_size + 1)
+        with self._lock:
+            channel = self._channels.get(session_id)
+            if channel is None:
+                channel = self._channels[session_id] = _Channel(self._queue_size)
+            for frame in channel.history:
+                q.put_nowait(frame)
+            if channel.closed:
+                q.put_nowait(None)
+                del self._channels[session_id]
+            else:
+                channel.subscribers.append(q)
+        return q
+
+    def unsubscribe(self, session_id: str, q: queue.Queue) -> None:
+        with self._lock:
+            channel = self._channels.get(session_id)
+            if channel is not None and q in channel.subscribers:
+                channel.subscribers.remove(q)
+
+    def publish(self, session_id: str, payload, timeout: float = 0) -> None:
+        """Serialize payload once and queue it for every subscriber of an open channel.
+
+        Frames are dropped for subscribers whose queue stays full for timeout seconds.
+        """
+        frame = sse_frame(payload)
+        with self._lock:
+            channel = self._channels.get(session_id)
+            if channel is None or channel.closed:
+                return
+            channel.history.append(frame)
+            subscribers = list(channel.subscribers)
+        for q in subscribers:
+            self._put(q, frame, timeout)
+
+    def close(self, session_id: str, payload=None, timeout: float = 0) -> None:
+        """Publish a final payload, if given, and end every subscriber's stream."""
+        if payload is not None:
+            self.publish(session_id, payload, timeout)
+        with self._lock:
+            channel = self._channels.get(session_id)
+            if channel is None or channel.closed:
+                return
+            channel.closed = True
+            subscribers, channel.subscribers = channel.subscribers, []
+            # Subscribers that saw the run have everything; keep the history only
+            # for a client that has not connected yet
+            if subscribers:
+                del self._channels[session_id]
+        for q in subscribers:
+            self._put(q, None, timeout)
+
+    @staticmethod
+    def _put(q: queue.Queue, frame: Optional[bytes], timeout: float) -> None:
+        try:
+            q.put(frame, block=timeout > 0, timeout=timeout or None)
+        except queue.Full:
+            pass
@@ -1,30 +1,58 @@
-from flask import Flask, request, jsonify, render_template_string, Response, stream_with_context
+from flask import Flask, request, Response, stream_with_context
+from jinja2 import Environment, select_autoescape
+import re
 import time
-import json
+import hashlib
+import orjson
 import logging
 import threading
 import queue
+from concurrent.futures import Future
+from contextvars import ContextVar
 from src.agent import DevOpsAgent
 from src.config.settings import AI_PROVIDERS, DEFAULT_AI_PROVIDER
-from src.agent.ai_providers import get_ai_provider
+from src.agent.ai_providers import get_cached_ai_provider
+from src.api.events import EventBus, sse_frame
+
+logger = logging.getLogger(__name__)
 
 # Initialize agent
 devops_agent = DevOpsAgent()
 
 # Create Flask app
 app = Flask(__name__)
+# Static assets are versioned with ?v=N in HTML_TEMPLATE, so browsers may keep them for a year
+app.config["SEND_FILE_MAX_AGE_DEFAULT"] = 31536000
+
+@app.after_request
+def _cache_static_assets(response):
+    """Mark versioned static assets immutable so browsers skip revalidation."""
+    if request.path.startswith(app.static_url_path + "/"):
+        response.cache_control.immutable = True
+    return response
+
+# Progress updates by session ID; abandoned sessions expire after 15 minutes
+progress_bus = EventBus(maxsize=1024, ttl=900, queue_size=64)
+
+def _normalize_url(url):
+    """Strip whitespace and a leading @ from a submitted URL and make sure it has a scheme."""
+    url = url.strip().lstrip('@')
+    if url and not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    return url
 
-# Create a queue for progress updates
-progress_updates = {}
+def _json(obj, status=200):
+    """Serialize obj into a JSON response using orjson."""
+    return Response(orjson.dumps(obj), status=status, mimetype="application/json")
 
 # Add a simple debug endpoint
 @app.route('/debug', methods=['GET'])
 def debug():
     """Simple debug endpoint to test API connectivity."""
-    return jsonify({
+    return _json({
         "status": "ok",
         "message": "API is working",
-        "providers": AI_PROVIDERS,
+        "providers": dict(AI_PROVIDERS),
         "default_provider": DEFAULT_AI_PROVIDER
     })
 
@@ -34,95 +62,159 @@ def test_provider(provider_name):
     """Test a specific AI provider."""
     try:
         model = request.args.get('model', None)
-        provider = get_ai_provider(provider_name, model)
+        provider = get_cached_ai_provider(provider_name, model)
         
         # Just initialize the provider without making an actual API call
-        return jsonify({
+        return _json({
             "status": "ok",
             "message": f"Successfully initialized {provider_name} provider",
             "model": model or "default model",
             "provider_type": provider.__class__.__name__
         })
     except Exception as e:
-        return jsonify({
+        return _json({
             "status": "error",
             "message": str(e)
-        }), 500
+        }, 500)
+
+# Seconds between SSE heartbeats on an idle progress stream
+HEARTBEAT_INTERVAL = 15
+
+# Frames sent to every progress stream, encoded once
+_SSE_CONNECTED = b': connected\n\n'
+_SSE_HEARTBEAT = b': heartbeat\n\n'
+_SSE_INITIALIZING = sse_frame({"status": "initializing", "message": "Starting analysis..."})
 
 # SSE endpoint for progress updates
 @app.route('/stream-progress/<session_id>', methods=['GET'])
 def stream_progress(session_id):
     """Stream progress updates to the client."""
     def generate():
-        if session_id not in progress_updates:
-            progress_updates[session_id] = queue.Queue()
-        
-        q = progress_updates[session_id]
-        
-        # Send initial event
-        yield 'data: ' + json.dumps({"status": "initializing", "message": "Starting analysis..."}) + '\n\n'
-        
-        while True:
-            try:
-                # Get updates from the queue with a timeout
-                update = q.get(timeout=1)
-                if update == "DONE":
-                    yield 'data: ' + json.dumps({"status": "complete", "message": "Analysis complete"}) + '\n\n'
-                    break
-                yield 'data: ' + json.dumps(update) + '\n\n'
-            except queue.Empty:
-                # Send heartbeat to keep connection alive
-                yield ': heartbeat\n\n'
-            except Exception as e:
-                yield 'data: ' + json.dumps({"status": "error", "message": str(e)}) + '\n\n'
-                break
+        q = progress_bus.subscribe(session_id)
+        try:
+            # Flush headers and open the stream before the first update is ready
+            yield _SSE_CONNECTED
+            
+            # Send initial event
+            yield _SSE_INITIALIZING
+            
+            while True:
+                try:
+                    # Block until the next frame, sending a heartbeat if none arrives in time
+                    frame = q.get(timeout=HEARTBEAT_INTERVAL)
+                    if frame is None:
+                        break
+                    yield frame
+                except queue.Empty:
+                    if progress_bus.is_closed(session_id):
+                        break
+                    # Send heartbeat to keep connection alive
+                    yield _SSE_HEARTBEAT
+        finally:
+            progress_bus.unsubscribe(session_id, q)
     
-    return Response(stream_with_context(generate()), content_type='text/event-stream')
+    response = Response(stream_with_context(generate()), content_type='text/event-stream')
+    # Tell reverse proxies such as nginx not to buffer the event stream
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
 
-# Background task for processing requests
-def process_in_background(text, user_id, provider, model, session_id):
-    """Process a request in the background and update progress."""
-    q = progress_updates[session_id]
+# (session ID, provider) of the request being processed in the current context
+_PROGRESS_CONTEXT = ContextVar("progress_context", default=None)
+
+# Progress updates for the web UI, by the log message that triggers them. Earlier
+# entries take precedence; messages are formatted with the log message and provider.
+_PROGRESS_STATUSES = (
+    ("Initializing", "initializing", "{msg}"),
+    ("Parsing", "parsing", "Parsing Azure DevOps URL..."),
+    ("Retrieving logs", "retrieving", "Retrieving build logs..."),
+    ("Successfully retrieved logs", "processing", "Processing log data..."),
+    ("Starting log analysis", "analyzing", "Analyzing with {provider}..."),
+    ("Sending request to", "generating", "Generating analysis..."),
+    ("Successfully generated|Analysis complete", "finishing", "Completing analysis..."),
+    ("Error retrieving", "error", "Error retrieving logs: {msg}"),
+    ("Failed to parse", "error", "Failed to parse URL: {msg}"),
+    ("(?i:error|exception)", "error", "Error: {msg}"),
+)
+# One anchored alternation with a group per entry; trying the alternatives in
+# order keeps the table's precedence in a single match call
+_PROGRESS_RE = re.compile(
+    "^(?:" + "|".join(f".*?({pattern})" for pattern, _, _ in _PROGRESS_STATUSES) + ")",
+    re.DOTALL
+)
+
+def _progress_update(msg, provider):
+    """Map a log message to a progress update for the web UI, or None."""
+    match = _PROGRESS_RE.match(msg)
+    if not match:
+        return None
+    _, status, message = _PROGRESS_STATUSES[match.lastindex - 1]
+    return {"status": status, "message": message.format(msg=msg, provider=provider)}
+
+class _ProgressHandler(logging.Handler):
+    """Publish log records as progress updates of the session that emitted them."""
     
-    # Update progress based on logs
-    def log_handler(record):
-        msg = record.getMessage()
-        if "Initializing" in msg:
-            q.put({"status": "initializing", "message": msg})
-        elif "Parsing" in msg:
-            q.put({"status": "parsing", "message": "Parsing Azure DevOps URL..."})
-        elif "Retrieving logs" in msg:
-            q.put({"status": "retrieving", "message": "Retrieving build logs..."})
-        elif "Successfully retrieved logs" in msg:
-            q.put({"status": "processing", "message": "Processing log data..."})
-        elif "Starting log analysis" in msg:
-            q.put({"status": "analyzing", "message": f"Analyzing with {provider}..."})
-        elif "Sending request to" in msg:
-            q.put({"status": "generating", "message": "Generating analysis..."})
-        elif "Successfully generated" in msg or "Analysis complete" in msg:
-            q.put({"status": "finishing", "message": "Completing analysis..."})
-        # Add more detailed status updates based on more log messages
-        elif "Error retrieving" in msg:
-            q.put({"status": "error", "message": "Error retrieving logs: " + msg})
-        elif "Failed to parse" in msg:
-            q.put({"status": "error", "message": "Failed to parse URL: " + msg})
-        elif "error" in msg.lower() or "exception" in msg.lower():
-            q.put({"status": "error", "message": "Error: " + msg})
+    def emit(self, record):
+        context = _PROGRESS_CONTEXT.get()
+        if context is None:
+            return
+        session_id, provider = context
+        if progress_bus.is_closed(session_id):
+            return
+        update = _progress_update(record.getMessage(), provider)
+        if update:
+            progress_bus.publish(session_id, update)
+
+# One handler for all sessions, on the application's logger hierarchy so root
+# logger configuration (e.g. logging.basicConfig) is unaffected
+_progress_handler = _ProgressHandler(level=logging.INFO)
+logging.getLogger("src").addHandler(_progress_handler)
+
+# Futures for submissions being processed, so identical concurrent ones share a result
+_INFLIGHT = {}
+_INFLIGHT_LOCK = threading.Lock()
+
+def _process_once(url, query, user_id, provider, model):
+    """Run process_parsed, or wait for an identical request that is already running."""
+    key = hashlib.sha256("|".join([url, query, provider or "", model or ""]).encode()).hexdigest()
+    with _INFLIGHT_LOCK:
+        future = _INFLIGHT.get(key)
+        is_leader = future is None
+        if is_leader:
+            future = _INFLIGHT[key] = Future()
     
-    # Add handler to capture log messages
-    handler = logging.Handler()
-    handler.emit = log_handler
-    logger = logging.getLogger()
-    logger.addHandler(handler)
+    if not is_leader:
+        return future.result()
     
     try:
-        # Process request
-        devops_agent.process_request(text, user_id, provider, model)
+        result = devops_agent.process_parsed(url, query, user_id, provider, model)
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        future.set_exception(e)
+        raise
     finally:
-        # Remove handler
-        logger.removeHandler(handler)
-        # Signal completion
-        q.put("DONE")
+        with _INFLIGHT_LOCK:
+            _INFLIGHT.pop(key, None)
+
+# Background task for processing requests
+def process_in_background(url, query, user_id, provider, model, session_id):
+    """Process a request in the background and update progress."""
+    progress_bus.open(session_id)
+    token = _PROGRESS_CONTEXT.set((session_id, provider))
+    try:
+        try:
+            result = _process_once(url, query, user_id, provider, model)
+        finally:
+            _PROGRESS_CONTEXT.reset(token)
+        # Hand the result to the client over SSE
+        progress_bus.publish(session_id, {"status": "result", "result": result, "provider": provider, "model": model}, timeout=5)
+    except Exception as e:
+        # Logged outside the session's context, so the page gets the error only once
+        logger.exception(f"Error processing request for session {session_id}: {e}")
+        progress_bus.publish(session_id, {"status": "error", "message": f"Error processing request: {e}"}, timeout=5)
+    finally:
+        # Signal completion and end the session's streams
+        progress_bus.close(session_id, {"status": "complete", "message": "Analysis complete"}, timeout=5)
 
 # Models available for each provider
 PROVIDER_MODELS = {
@@ -151,336 +243,8 @@ HTML_TEMPLATE = '''
 <html>
 <head>
     <title>Azure DevOps Log Analyzer</title>
-    <style>
-        body {
-            font-family: Arial, sans-serif;
-            max-width: 800px;
-            margin: 0 auto;
-            padding: 20px;
-        }
-        .form-group {
-            margin-bottom: 15px;
-        }
-        label {
-            display: block;
-            margin-bottom: 5px;
-            font-weight: bold;
-        }
-        input[type="text"], textarea, select {
-            width: 100%;
-            padding: 8px;
-            box-sizing: border-box;
-        }
-        textarea {
-            height: 120px;
-        }
-        button {
-            background-color: #0078d4;
-            color: white;
-            border: none;
-            padding: 10px 15px;
-            cursor: pointer;
-            margin-right: 10px;
-        }
-        .secondary-button {
-            background-color: #666;
-        }
-        .url-valid {
-            color: green;
-            font-weight: bold;
-            display: none;
-            margin-top: 5px;
-        }
-        .url-invalid {
-            color: red;
-            font-weight: bold;
-            display: none;
-            margin-top: 5px;
-        }
-        .results {
-            margin-top: 20px;
-            white-space: pre-wrap;
-            border: 1px solid #ddd;
-            padding: 15px;
-            background-color: #f8f8f8;
-        }
-        .model-selector {
-            display: flex;
-            gap: 10px;
-        }
-        .model-selector > div {
-            flex: 1;
-        }
-        .loader {
-            border: 4px solid #f3f3f3;
-            border-top: 4px solid #0078d4;
-            border-radius: 50%;
-            width: 30px;
-            height: 30px;
-            animation: spin 1s linear infinite;
-            display: inline-block;
-            margin-right: 10px;
-            vertical-align: middle;
-        }
-        .loading-info {
-            display: none;
-            margin-top: 20px;
-            padding: 15px;
-            background-color: #f0f7ff;
-            border: 1px solid #cce5ff;
-            border-radius: 4px;
-        }
-        .state {
-            font-weight: bold;
-            color: #0078d4;
-        }
-        .error-state {
-            font-weight: bold;
-            color: #d40000;
-        }
-        @keyframes spin {
-            0% { transform: rotate(0deg); }
-            100% { transform: rotate(360deg); }
-        }
-        .progress-bar {
-            height: 6px;
-            background-color: #ddd;
-            border-radius: 3px;
-            margin-top: 10px;
-            overflow: hidden;
-        }
-        .progress-value {
-            height: 100%;
-            background-color: #0078d4;
-            width: 10%;
-            border-radius: 3px;
-            transition: width 0.5s;
-        }
-        .status-history {
-            margin-top: 10px;
-            max-height: 100px;
-            overflow-y: auto;
-            font-size: 12px;
-            color: #666;
-        }
-    </style>
-    <script>
-        // Generate a unique session ID
-        const sessionId = Date.now().toString() + Math.random().toString(36).substr(2, 5);
-        let eventSource;
-        let progressSteps = [
-            "Initializing", 
-            "Connecting to Azure DevOps",
-            "Parsing URLs",
-            "Retrieving build info",
-            "Fetching build logs",
-            "Processing log data",
-            "Initializing AI model",
-            "Analyzing build failures",
-            "Generating recommendations",
-            "Preparing results"
-        ];
-        let currentProgressStep = 0;
-        let statusHistory = [];
-        
-        function updateModelOptions() {
-            const provider = document.getElementById('provider').value;
-            const modelSelect = document.getElementById('model');
-            
-            // Clear existing options
-            modelSelect.innerHTML = '';
-            
-            // Get models for the selected provider
-            const models = {
-                'openai': ['gpt-4o', 'gpt-4-turbo', 'gpt-3.5-turbo'],
-                'openrouter': ['openai/gpt-4-turbo', 'anthropic/claude-3-opus', 'anthropic/claude-3-sonnet', 'mistralai/mistral-large', 'meta-llama/llama-3-70b-instruct'],
-                'gemini': ['gemini-1.5-pro', 'gemini-1.5-flash', 'gemini-1.0-pro']
-            };
-            
-            // Add options for the selected provider
-            if (provider in models) {
-                models[provider].forEach(model => {
-                    const option = document.createElement('option');
-                    option.value = model;
-                    option.textContent = model;
-                    modelSelect.appendChild(option);
-                });
-            }
-        }
-        
-        function validateURL(url) {
-            // Basic validation for Azure DevOps URL
-            return url && 
-                   url.trim() !== '' && 
-                   (url.includes('buildId=') || url.includes('_build/')) && 
-                   (url.includes('tfs/') || url.includes('azure'));
-        }
-        
-        function testURL() {
-            const urlInput = document.getElementById('url');
-            const url = urlInput.value.trim();
-            const validElement = document.getElementById('url-valid');
-            const invalidElement = document.getElementById('url-invalid');
-            
-            if (validateURL(url)) {
-                validElement.style.display = 'block';
-                invalidElement.style.display = 'none';
-            } else {
-                validElement.style.display = 'none';
-                invalidElement.style.display = 'block';
-            }
-        }
-        
-        function showLoading() {
-            // Validate URL before submission
-            const urlInput = document.getElementById('url');
-            const url = urlInput.value.trim();
-            
-            if (!validateURL(url)) {
-                alert('Please enter a valid Azure DevOps URL with a buildId parameter');
-                return false;
-            }
-            
-            document.getElementById('loading-info').style.display = 'block';
-            document.getElementById('analyzeBtn').disabled = true;
-            document.getElementById('url').disabled = true;
-            document.getElementById('query').disabled = true;
-            document.getElementById('provider').disabled = true;
-            document.getElementById('model').disabled = true;
-            document.getElementById('testUrlBtn').disabled = true;
-            
-            // Initialize status history
-            statusHistory = [];
-            document.getElementById('status-history').innerHTML = '';
-            
-            // Start progress updates
-            startProgressUpdates();
-            
-            return true;
-        }
-        
-        function addStatusMessage(message, isError = false) {
-            const historyDiv = document.getElementById('status-history');
-            const timestamp = new Date().toLocaleTimeString();
-            
-            // Add to our array
-            statusHistory.push({message, timestamp, isError});
-            
-            // Keep only last 20 messages
-            if (statusHistory.length > 20) {
-                statusHistory.shift();
-            }
-            
-            // Update display
-            historyDiv.innerHTML = '';
-            statusHistory.forEach(status => {
-                const msgClass = status.isError ? 'error-state' : '';
-                historyDiv.innerHTML += `<div class="${msgClass}">[${status.timestamp}] ${status.message}</div>`;
-            });
-            
-            // Scroll to bottom
-            historyDiv.scrollTop = historyDiv.scrollHeight;
-        }
-        
-        function startProgressUpdates() {
-            // Connect to the server-sent events endpoint
-            eventSource = new EventSource(`/stream-progress/${sessionId}`);
-            
-            // Progress bar 
-            let progressBar = document.querySelector('.progress-value');
-            let progressPercent = 10;
-            
-            // Handle incoming events
-            eventSource.onmessage = function(event) {
-                const data = JSON.parse(event.data);
-                
-                if (data.status === "complete") {
-                    // Analysis complete, progress to 100%
-                    progressPercent = 100;
-                    progressBar.style.width = progressPercent + '%';
-                    addStatusMessage("Analysis complete");
-                    
-                    // Disconnect from the stream
-                    if (eventSource) {
-                        eventSource.close();
-                    }
-                    
-                    // We'll let the page reload handle this
-                    return;
-                }
-                
-                // Update the state message
-                const stateElement = document.getElementById('current-state');
-                if (stateElement) {
-                    const message = data.message || progressSteps[currentProgressStep];
-                    stateElement.textContent = message;
-                    
-                    // Add message to history
-                    const isError = data.status === "error";
-                    if (isError) {
-                        stateElement.className = 'error-state';
-                    } else {
-                        stateElement.className = 'state';
-                    }
-                    
-                    addStatusMessage(message, isError);
-                    
-                    // Update progress bar (only for non-error statuses)
-                    if (!isError) {
-                        currentProgressStep++;
-                        progressPercent = Math.min(90, 10 + (currentProgressStep * 8));
-                        progressBar.style.width = progressPercent + '%';
-                    } else {
-                        // For errors, set progress bar to red
-                        progressBar.style.backgroundColor = '#d40000';
-                    }
-                }
-            };
-            
-            eventSource.onerror = function(event) {
-                console.error("EventSource error:", event);
-                addStatusMessage("Connection error with server", true);
-                if (eventSource) {
-                    eventSource.close();
-                }
-            };
-        }
-        
-        document.addEventListener('DOMContentLoaded', function() {
-            updateModelOptions();
-            document.getElementById('provider').addEventListener('change', updateModelOptions);
-            
-            // Add session ID to the form
-            const form = document.getElementById('analyzeForm');
-            const sessionInput = document.createElement('input');
-            sessionInput.type = 'hidden';
-            sessionInput.name = 'session_id';
-            sessionInput.value = sessionId;
-            form.appendChild(sessionInput);
-            
-            // Handle form submission
-            form.addEventListener('submit', function(e) {
-                // Check if URL is provided and valid
-                const urlInput = document.getElementById('url');
-                const url = urlInput.value.trim();
-                
-                if (!validateURL(url)) {
-                    e.preventDefault();
-                    alert('Please enter a valid Azure DevOps URL with a buildId parameter');
-                    return false;
-                }
-                
-                return showLoading();
-            });
-            
-            // Add URL validation on input change
-            document.getElementById('url').addEventListener('input', function() {
-                // Hide status indicators when typing
-                document.getElementById('url-valid').style.display = 'none';
-                document.getElementById('url-invalid').style.display = 'none';
-            });
-        });
-    </script>
+    <link rel="stylesheet" href="/static/analyzer.css?v=1">
+    <script src="/static/analyzer.js?v=3"></script>
 </head>
 <body>
     <h1>Azure DevOps Log Analyzer</h1>
@@ -534,6 +298,12 @@ HTML_TEMPLATE = '''
         <div id="status-history" class="status-history"></div>
     </div>
     
+    <div id="live-results" class="results" style="display: none;">
+        <h2>Analysis:</h2>
+        <p><strong id="live-provider"></strong></p>
+        <div id="live-result-text"></div>
+    </div>
+    
     {% if result %}
     <div class="results">
         <h2>Analysis:</h2>
@@ -559,115 +329,121 @@ HTML_TEMPLATE = '''
 </html>
 '''
 
+# Compile the page template once instead of on every request
+_JINJA_ENV = Environment(autoescape=select_autoescape(["html"]))
+_INDEX_TMPL = _JINJA_ENV.from_string(HTML_TEMPLATE)
+# The page without a result only depends on static settings, so render it once too
+_INDEX_GET_HTML = _INDEX_TMPL.render(
+    result=None,
+    providers=AI_PROVIDERS,
+    default_provider=DEFAULT_AI_PROVIDER,
+    used_provider=DEFAULT_AI_PROVIDER,
+    used_model=None
+)
+
 @app.route('/', methods=['GET', 'POST'])
 def index():
     """Main route for the web interface."""
-    result = None
-    used_provider = DEFAULT_AI_PROVIDER
-    used_model = None
+    if request.method == 'GET':
+        return _INDEX_GET_HTML
     
-    if request.method == 'POST':
-        # Add debug logging to see raw form input
-        logger = logging.getLogger(__name__)
-        logger.info(f"Raw form data received: {request.form}")
-        
-        url = request.form.get('url', '').strip()
-        logger.info(f"Original URL from form: '{url}'")
-        
-        # Remove leading @ if present
-        if url.startswith('@'):
-            url = url[1:]
-            logger.info(f"URL after @ removal: '{url}'")
-        
-        query = request.form.get('query', 'What caused this build to fail and how can I fix it?')
-        provider = request.form.get('provider', DEFAULT_AI_PROVIDER)
-        model = request.form.get('model')
-        session_id = request.form.get('session_id', '')
-        
-        used_provider = provider
-        used_model = model
-        
-        # Add session to progress updates if not already there
-        if session_id and session_id not in progress_updates:
-            progress_updates[session_id] = queue.Queue()
-        
-        # Make sure URL is properly formatted
-        if url and not (url.startswith('http://') or url.startswith('https://')):
-            url = 'https://' + url
-            logger.info(f"URL after adding https://: '{url}'")
-            
-        # Combine URL and query to match expected format
-        text = f"{url} {query}"
-        logger.info(f"Final text sent to process_request: '{text}'")
-        
-        if session_id:
-            # Start processing in background
-            threading.Thread(
-                target=process_in_background,
-                args=(text, "web_user", provider, model, session_id)
-            ).start()
-        
-        # Process request with selected model
-        result = devops_agent.process_request(
-            text, 
-            user_id="web_user", 
-            provider=provider, 
-            model=model
-        )
+    # Add debug logging to see raw form input
+    logger.info(f"Raw form data received: {request.form}")
+    
+    url = _normalize_url(request.form.get('url', ''))
+    logger.info(f"URL from form: '{url}'")
+    
+    query = request.form.get('query', 'What caused this build to fail and how can I fix it?')
+    provider = request.form.get('provider', DEFAULT_AI_PROVIDER)
+    model = request.form.get('model')
+    session_id = request.form.get('session_id', '')
+    
+    # Open the session's progress channel if not already there
+    if session_id:
+        progress_bus.open(session_id)
+    
+    if session_id:
+        # Process in the background; the result is delivered over /stream-progress
+        threading.Thread(
+            target=process_in_background,
+            args=(url, query, "web_user", provider, model, session_id)
+        ).start()
+        return _json({"status": "accepted", "session_id": session_id}, 202)
     
-    return render_template_string(
-        HTML_TEMPLATE, 
+    # Process request with selected model
+    result = devops_agent.process_parsed(
+        url,
+        query,
+        user_id="web_user", 
+        provider=provider, 
+        model=model
+    )
+
+    return _INDEX_TMPL.render(
         result=result, 
         providers=AI_PROVIDERS,
         default_provider=DEFAULT_AI_PROVIDER,
-        used_provider=used_provider,
-        used_model=used_model
+        used_provider=provider,
+        used_model=model
     )
 
 @app.route('/api/analyze', methods=['POST'])
-def api_analyze():
+async def api_analyze():
     """API endpoint for analyzing Azure DevOps logs."""
     data = request.json
     
     if not data or 'url' not in data:
-        return jsonify({"error": "URL is required"}), 400
-    
-    url = data.get('url', '').strip()
-    # Remove leading @ if present
-    if url.startswith('@'):
-        url = url[1:]
-        
-    # Make sure URL is properly formatted
-    if url and not (url.startswith('http://') or url.startswith('https://')):
-        url = 'https://' + url
+        return _json({"error": "URL is required"}, 400)
     
+    url = _normalize_url(data.get('url', ''))
     query = data.get('query', 'What caused this build to fail and how can I fix it?')
     user_id = data.get('user_id', 'api_user')
     provider = data.get('provider', DEFAULT_AI_PROVIDER)
     model = data.get('model')
     
-    # Combine URL and query
-    text = f"{url} {query}"
-    
     # Process request with the specified provider and model
-    result = devops_agent.process_request(
-        text, 
+    result = await devops_agent.aprocess_parsed(
+        url,
+        query,
         user_id=user_id,
         provider=provider,
         model=model
     )
     
-    return jsonify({
+    return _json({
         "result": result,
         "provider": provider,
         "model": model
     })
 
+@app.route('/api/analyze/stream', methods=['POST'])
+def api_analyze_stream():
+    """API endpoint that streams the analysis as plain text while it is generated."""
+    data = request.json
+    
+    if not data or 'url' not in data:
+        return _json({"error": "URL is required"}, 400)
+    
+    url = _normalize_url(data.get('url', ''))
+    query = data.get('query', 'What caused this build to fail and how can I fix it?')
+    user_id = data.get('user_id', 'api_user')
+    provider = data.get('provider', DEFAULT_AI_PROVIDER)
+    model = data.get('model')
+    
+    chunks = devops_agent.stream_parsed(
+        url,
+        query,
+        user_id=user_id,
+        provider=provider,
+        model=model
+    )
+    return Response(stream_with_context(chunks), mimetype="text/plain")
+
 @app.route('/api/providers', methods=['GET'])
 def get_providers():
     """API endpoint to get available AI providers and models."""
-    return jsonify({
-        "providers": AI_PROVIDERS,
+    return _json({
+        "providers": dict(AI_PROVIDERS),
         "models": PROVIDER_MODELS,
         "default_provider": DEFAULT_AI_PROVIDER
     }) 
\ No newline at end of file
@@ -0,0 +1,254 @@
+// Generate a unique session ID; every submission gets its own so a new
+// progress stream never picks up the previous run's events
+function newSessionId() {
+    return Date.now().toString() + Math.random().toString(36).substr(2, 5);
+}
+let eventSource;
+let progressSteps = [
+    "Initializing", 
+    "Connecting to Azure DevOps",
+    "Parsing URLs",
+    "Retrieving build info",
+    "Fetching build logs",
+    "Processing log data",
+    "Initializing AI model",
+    "Analyzing build failures",
+    "Generating recommendations",
+    "Preparing results"
+];
+let currentProgressStep = 0;
+let statusHistory = [];
+
+function updateModelOptions() {
+    const provider = document.getElementById('provider').value;
+    const modelSelect = document.getElementById('model');
+    
+    // Clear existing options
+    modelSelect.innerHTML = '';
+    
+    // Get models for the selected provider
+    const models = {
+        'openai': ['gpt-4o', 'gpt-4-turbo', 'gpt-3.5-turbo'],
+        'openrouter': ['openai/gpt-4-turbo', 'anthropic/claude-3-opus', 'anthropic/claude-3-sonnet', 'mistralai/mistral-large', 'meta-llama/llama-3-70b-instruct'],
+        'gemini': ['gemini-1.5-pro', 'gemini-1.5-flash', 'gemini-1.0-pro']
+    };
+    
+    // Add options for the selected provider
+    if (provider in models) {
+        models[provider].forEach(model => {
+            const option = document.createElement('option');
+            option.value = model;
+            option.textContent = model;
+            modelSelect.appendChild(option);
+        });
+    }
+}
+
+function validateURL(url) {
+    // Basic validation for Azure DevOps URL
+    return url && 
+           url.trim() !== '' && 
+           (url.includes('buildId=') || url.includes('_build/')) && 
+           (url.includes('tfs/') || url.includes('azure'));
+}
+
+function testURL() {
+    const urlInput = document.getElementById('url');
+    const url = urlInput.value.trim();
+    const validElement = document.getElementById('url-valid');
+    const invalidElement = document.getElementById('url-invalid');
+    
+    if (validateURL(url)) {
+        validElement.style.display = 'block';
+        invalidElement.style.display = 'none';
+    } else {
+        validElement.style.display = 'none';
+        invalidElement.style.display = 'block';
+    }
+}
+
+function showLoading(sessionId) {
+    // Validate URL before submission
+    const urlInput = document.getElementById('url');
+    const url = urlInput.value.trim();
+    
+    if (!validateURL(url)) {
+        alert('Please enter a valid Azure DevOps URL with a buildId parameter');
+        return false;
+    }
+    
+    document.getElementById('loading-info').style.display = 'block';
+    document.getElementById('live-results').style.display = 'none';
+    setFormDisabled(true);
+    
+    // Initialize status history
+    statusHistory = [];
+    document.getElementById('status-history').innerHTML = '';
+    
+    // Start progress updates
+    startProgressUpdates(sessionId);
+    
+    return true;
+}
+
+function setFormDisabled(disabled) {
+    ['analyzeBtn', 'url', 'query', 'provider', 'model', 'testUrlBtn'].forEach(id => {
+        document.getElementById(id).disabled = disabled;
+    });
+}
+
+function failSubmission(error) {
+    // The run never started, so no progress will arrive; stop waiting for it
+    const message = "Failed to submit request: " + error;
+    const stateElement = document.getElementById('current-state');
+    if (stateElement) {
+        stateElement.textContent = message;
+        stateElement.className = 'error-state';
+    }
+    addStatusMessage(message, true);
+    if (eventSource) {
+        eventSource.close();
+    }
+    setFormDisabled(false);
+}
+
+function showResult(data) {
+    // Render as text so model output is never interpreted as HTML
+    document.getElementById('live-provider').textContent = `Using ${data.provider} / ${data.model}`;
+    document.getElementById('live-result-text').textContent = data.result;
+    document.getElementById('live-results').style.display = 'block';
+}
+
+function addStatusMessage(message, isError = false) {
+    const historyDiv = document.getElementById('status-history');
+    const timestamp = new Date().toLocaleTimeString();
+    
+    // Add to our array
+    statusHistory.push({message, timestamp, isError});
+    
+    // Keep only last 20 messages
+    if (statusHistory.length > 20) {
+        statusHistory.shift();
+    }
+    
+    // Update display
+    historyDiv.innerHTML = '';
+    statusHistory.forEach(status => {
+        const msgClass = status.isError ? 'error-state' : '';
+        historyDiv.innerHTML += `<div class="${msgClass}">[${status.timestamp}] ${status.message}</div>`;
+    });
+    
+    // Scroll to bottom
+    historyDiv.scrollTop = historyDiv.scrollHeight;
+}
+
+function startProgressUpdates(sessionId) {
+    // Connect to the server-sent events endpoint
+    eventSource = new EventSource(`/stream-progress/${sessionId}`);
+    
+    // Progress bar 
+    let progressBar = document.querySelector('.progress-value');
+    let progressPercent = 10;
+    
+    // Handle incoming events
+    eventSource.onmessage = function(event) {
+        const data = JSON.parse(event.data);
+        
+        if (data.status === "complete") {
+            // Analysis complete, progress to 100%
+            progressPercent = 100;
+            progressBar.style.width = progressPercent + '%';
+            addStatusMessage("Analysis complete");
+            
+            // Disconnect from the stream
+            if (eventSource) {
+                eventSource.close();
+            }
+            
+            setFormDisabled(false);
+            document.getElementById('loading-info').style.display = 'none';
+            return;
+        }
+        
+        if (data.status === "result") {
+            showResult(data);
+            return;
+        }
+        
+        // Update the state message
+        const stateElement = document.getElementById('current-state');
+        if (stateElement) {
+            const message = data.message || progressSteps[currentProgressStep];
+            stateElement.textContent = message;
+            
+            // Add message to history
+            const isError = data.status === "error";
+            if (isError) {
+                stateElement.className = 'error-state';
+            } else {
+                stateElement.className = 'state';
+            }
+            
+            addStatusMessage(message, isError);
+            
+            // Update progress bar (only for non-error statuses)
+            if (!isError) {
+                currentProgressStep++;
+                progressPercent = Math.min(90, 10 + (currentProgressStep * 8));
+                progressBar.style.width = progressPercent + '%';
+            } else {
+                // For errors, set progress bar to red
+                progressBar.style.backgroundColor = '#d40000';
+            }
+        }
+    };
+    
+    eventSource.onerror = function(event) {
+        console.error("EventSource error:", event);
+        addStatusMessage("Connection error with server", true);
+        if (eventSource) {
+            eventSource.close();
+        }
+    };
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    updateModelOptions();
+    document.getElementById('provider').addEventListener('change', updateModelOptions);
+    
+    const form = document.getElementById('analyzeForm');
+    
+    // Handle form submission
+    form.addEventListener('submit', function(e) {
+        e.preventDefault();
+        
+        // Collect the fields before showLoading disables them
+        const sessionId = newSessionId();
+        const formData = new FormData(form);
+        formData.set('session_id', sessionId);
+        if (!showLoading(sessionId)) {
+            return false;
+        }
+        
+        // The server answers 202 right away; the result arrives over SSE
+        fetch('/', {method: 'POST', body: formData}).then(response => {
+            if (response.status === 202) {
+                return;
+            }
+            // Use the server's error message when the body carries one
+            return response.json().catch(() => ({})).then(data => {
+                failSubmission(data.error || data.message || `HTTP ${response.status}`);
+            });
+        }).catch(error => {
+            failSubmission(error);
+        });
+        return false;
+    });
+    
+    // Add URL validation on input change
+    document.getElementById('url').addEventListener('input', function() {
+        // Hide status indicators when typing
+        document.getElementById('url-valid').style.display = 'none';
+        document.getElementById('url-invalid').style.display = 'none';
+    });
+});
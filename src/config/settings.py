@@ -1,36 +1,99 @@
 import os
+import hashlib
+from types import MappingProxyType
 from dotenv import load_dotenv
 
-# Load environment variables from .env file if it exists
-load_dotenv()
 
-# Azure DevOps settings
-AZURE_DEVOPS_PAT = os.environ.get("AZURE_DEVOPS_PAT")
-AZURE_DEVOPS_ORG = os.environ.get("AZURE_DEVOPS_ORG")
+def _load_env():
+    """Apply .env to the environment, using the compiled values while they are current.
 
-# AI settings
-AI_API_KEY = os.environ.get("AI_API_KEY")
-AI_API_BASE_URL = os.environ.get("AI_API_BASE_URL", "https://api.aimlapi.com/v1")
-AI_MODEL = os.environ.get("AI_MODEL", "gpt-4o")
+    compile_settings.py writes _settings_compiled.py with the .env values and its
+    SHA-256; if that is missing or stale, fall back to parsing .env with python-dotenv.
+    """
+    try:
+        from ._settings_compiled import _COMPILED_HASH, _COMPILED_PATH, _COMPILED_VALUES
+        with open(_COMPILED_PATH, "rb") as f:
+            current = hashlib.sha256(f.read()).hexdigest() == _COMPILED_HASH
+    except (ImportError, OSError):
+        current = False
+    if not current:
+        load_dotenv()
+        return
+    # Like load_dotenv, never override variables that are already set
+    for key, value in _COMPILED_VALUES.items():
+        os.environ.setdefault(key, value)
 
-# OpenRouter settings
-OPENROUTER_API_KEY = os.environ.get("OPENROUTER_API_KEY")
-OPENROUTER_BASE_URL = os.environ.get("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
 
-# Gemini settings
-GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
-GEMINI_MODEL = os.environ.get("GEMINI_MODEL", "gemini-1.5-pro")
+# Load environment variables from .env file if it exists; the sentinel survives
+# importlib.reload so the file is only parsed once per process
+if not globals().get("_DOTENV_LOADED"):
+    _load_env()
+    _DOTENV_LOADED = True
 
-# Model provider options
-AI_PROVIDERS = {
+_E = os.environ
+
+# Settings read from the environment: name -> (variable, default, type).
+# Each is resolved on first access by __getattr__ and then kept as a module global.
+_SPEC = {
+    # Azure DevOps settings
+    "AZURE_DEVOPS_PAT": ("AZURE_DEVOPS_PAT", None, str),
+    "AZURE_DEVOPS_ORG": ("AZURE_DEVOPS_ORG", None, str),
+
+    # Azure DevOps HTTP timeouts in seconds
+    "AZDO_CONNECT_TIMEOUT": ("AZDO_CONNECT_TIMEOUT", "3.0", float),
+    "AZDO_READ_TIMEOUT": ("AZDO_READ_TIMEOUT", "15.0", float),
+
+    # Build log cache; logs of finished builds do not change, so entries can live long
+    "LOG_CACHE_SIZE": ("LOG_CACHE_SIZE", "256", int),
+    "LOG_CACHE_TTL": ("LOG_CACHE_TTL", "3600", int),
+
+    # AI analysis cache, keyed by logs, question, provider and model
+    "ANALYSIS_CACHE_SIZE": ("ANALYSIS_CACHE_SIZE", "256", int),
+    "ANALYSIS_CACHE_TTL": ("ANALYSIS_CACHE_TTL", "86400", int),
+
+    # AI settings
+    "AI_API_KEY": ("AI_API_KEY", None, str),
+    "AI_API_BASE_URL": ("AI_API_BASE_URL", "https://api.aimlapi.com/v1", str),
+    "AI_MODEL": ("AI_MODEL", "gpt-4o", str),
+
+    # OpenRouter settings
+    "OPENROUTER_API_KEY": ("OPENROUTER_API_KEY", None, str),
+    "OPENROUTER_BASE_URL": ("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1", str),
+
+    # Gemini settings
+    "GEMINI_API_KEY": ("GEMINI_API_KEY", None, str),
+    "GEMINI_MODEL": ("GEMINI_MODEL", "gemini-1.5-pro", str),
+
+    # Default AI provider
+    "DEFAULT_AI_PROVIDER": ("DEFAULT_AI_PROVIDER", "openai", str),
+
+    # Zoho Cliq settings
+    "ZOHO_CLIQ_BOT_NAME": ("ZOHO_CLIQ_BOT_NAME", None, str),
+    "ZOHO_CLIQ_WEBHOOK_TOKEN": ("ZOHO_CLIQ_WEBHOOK_TOKEN", None, str),
+}
+
+# Model provider options; a read-only view so importers cannot change them
+AI_PROVIDERS = MappingProxyType({
     "openai": "OpenAI",
     "openrouter": "OpenRouter",
     "gemini": "Gemini"
-}
+})
+
+__all__ = ["AI_PROVIDERS", *_SPEC]
+
+
+def __getattr__(name):
+    """Resolve a setting from the environment on first access (PEP 562)."""
+    spec = _SPEC.get(name)
+    if spec is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    env_var, default, cast = spec
+    value = _E.get(env_var, default)
+    if value is not None:
+        value = cast(value)
+    globals()[name] = value
+    return value
 
-# Default AI provider
-DEFAULT_AI_PROVIDER = os.environ.get("DEFAULT_AI_PROVIDER", "openai")
 
-# Zoho Cliq settings
-ZOHO_CLIQ_BOT_NAME = os.environ.get("ZOHO_CLIQ_BOT_NAME")
-ZOHO_CLIQ_WEBHOOK_TOKEN = os.environ.get("ZOHO_CLIQ_WEBHOOK_TOKEN") 
\ No newline at end of file
+def __dir__():
+    return sorted(set(globals()) | set(_SPEC))
@@ -0,0 +1,34 @@
+"""Shared helpers for the unit tests."""
+import functools
+import json
+from types import MappingProxyType
+from typing import NamedTuple
+
+from src.agent.azure_client import AzureDevOpsClient
+
+# Build URLs used across the tests
+TFS_BUILD_URL = "https://azure.asax.ir/tfs/AsaProjects/CustomerDevelopment/_build/results?buildId=868491&view=logs&j=c6dc1ccb-b334-5d4e-8705-9a961a97b18b&t=0ada1057-2299-54a0-1d11-75e5dcfc5f1c"
+AZURE_DEVOPS_BUILD_URL = "https://dev.azure.com/myorg/myproject/_build/results?buildId=12345"
+
+
+@functools.lru_cache(maxsize=None)
+def parse_url(url):
+    """Parse url once per test run; the result is read-only because it is shared."""
+    result = AzureDevOpsClient("dummy_pat", "dummy_org").parse_azure_devops_url(url)
+    return MappingProxyType(result) if result is not None else None
+
+
+class FakeResponse(NamedTuple):
+    """Immutable stand-in for the parts of a requests response the client reads."""
+    status_code: int = 200
+    content: bytes = b""
+    text: str = ""
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def fake_response(json_body=None, text="", status=200):
+    """Build a FakeResponse from a JSON body or plain text."""
+    content = json.dumps(json_body).encode() if json_body is not None else text.encode()
+    return FakeResponse(status, content, text or content.decode())
@@ -1,23 +1,41 @@
+import asyncio
+import copy
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, AsyncMock, MagicMock, Mock
 from src.agent.ai_agent import AIAnalysisAgent
+from src.agent.ai_providers import BatchingAnalyzer, OpenAIProvider, get_cached_ai_provider
 
 class TestAIAnalysisAgent(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Patch the provider factory once for the whole class to avoid actual
+        # initialization of providers; tests configure it per method
+        patcher = patch('src.agent.ai_providers.get_ai_provider')
+        cls.mock_get_provider = patcher.start()
+        cls.addClassCleanup(patcher.stop)
+        
+        # Agents hold no per-test state until their provider is first used, so
+        # build one per class and give each test a shallow copy
+        cls._template_agent = AIAnalysisAgent(api_key="test_key", provider="openai")
+        
     def setUp(self):
-        # Use patch to avoid actual initialization of providers
-        with patch('src.agent.ai_providers.OpenAIProvider') as mock_provider:
-            mock_instance = MagicMock()
-            mock_provider.return_value = mock_instance
-            self.agent = AIAnalysisAgent(api_key="test_key", provider="openai")
-            self.mock_provider = mock_instance
+        # Providers are cached per process; start every test without them
+        get_cached_ai_provider.cache_clear()
+        self.addCleanup(get_cached_ai_provider.cache_clear)
+        
+        # Mocks share their child mocks when copied, so each test gets a new one
+        self.mock_provider = MagicMock()
+        self.mock_get_provider.reset_mock(return_value=True, side_effect=True)
+        self.mock_get_provider.return_value = self.mock_provider
+        self.agent = copy.copy(self._template_agent)
     
-    @patch('src.agent.ai_providers.get_ai_provider')
-    def test_analyze_logs(self, mock_get_provider):
+    def test_analyze_logs(self):
         """Test the analyze_logs method with mocked provider"""
-        # Setup mock
-        mock_provider = MagicMock()
-        mock_provider.analyze_logs.return_value = "Analysis of the logs"
-        mock_get_provider.return_value = mock_provider
+        # Setup mock; a spec'd Mock only carries the attributes the agent uses
+        mock_provider = Mock(spec=['analyze_logs', 'max_context_chars'])
+        mock_provider.max_context_chars = 80000
+        mock_provider.analyze_logs = Mock(return_value="Analysis of the logs")
+        self.mock_get_provider.return_value = mock_provider
         
         # Create new agent with the mocked provider
         agent = AIAnalysisAgent(api_key="test_key", provider="openai")
@@ -32,15 +50,14 @@ class TestAIAnalysisAgent(unittest.TestCase):
         self.assertEqual(result, "Analysis of the logs")
         mock_provider.analyze_logs.assert_called_once_with(logs, query)
     
-    @patch('src.agent.ai_providers.get_ai_provider')
-    def test_change_provider(self, mock_get_provider):
+    def test_change_provider(self):
         """Test changing providers"""
         # Setup mocks
-        mock_provider1 = MagicMock()
-        mock_provider2 = MagicMock()
+        mock_provider1 = Mock(spec=[])
+        mock_provider2 = Mock(spec=[])
         
         # First call returns provider1, second call returns provider2
-        mock_get_provider.side_effect = [mock_provider1, mock_provider2]
+        self.mock_get_provider.side_effect = [mock_provider1, mock_provider2]
         
         # Create agent with initial provider
         agent = AIAnalysisAgent(api_key="test_key", provider="openai")
@@ -48,18 +65,20 @@ class TestAIAnalysisAgent(unittest.TestCase):
         # Change provider
         agent.change_provider("gemini", "gemini-1.5-pro")
         
-        # Verify
+        # Verify; providers are only built when first used
         self.assertEqual(agent.provider_name, "gemini")
         self.assertEqual(agent.model, "gemini-1.5-pro")
-        mock_get_provider.assert_called_with("gemini", "gemini-1.5-pro")
+        self.mock_get_provider.assert_not_called()
+        self.assertIs(agent.provider, mock_provider1)
+        self.mock_get_provider.assert_called_once_with("gemini", "gemini-1.5-pro")
     
-    @patch('src.agent.ai_providers.get_ai_provider')
-    def test_analyze_logs_error(self, mock_get_provider):
+    def test_analyze_logs_error(self):
         """Test error handling in analyze_logs"""
         # Setup mock to raise an exception
-        mock_provider = MagicMock()
-        mock_provider.analyze_logs.side_effect = Exception("API error")
-        mock_get_provider.return_value = mock_provider
+        mock_provider = Mock(spec=['analyze_logs', 'max_context_chars'])
+        mock_provider.max_context_chars = 80000
+        mock_provider.analyze_logs = Mock(side_effect=Exception("API error"))
+        self.mock_get_provider.return_value = mock_provider
         
         # Create agent with the mocked provider
         agent = AIAnalysisAgent(api_key="test_key", provider="openai")
@@ -71,7 +90,81 @@ class TestAIAnalysisAgent(unittest.TestCase):
         result = agent.analyze_logs(logs, query)
         
         # Verify error is handled gracefully
-        self.assertIn("Error analyzing logs", result)
+        self.assertEqual(result, "Error analyzing logs: API error")
+
+    def test_stream_logs(self):
+        """Test that stream_logs yields the provider's chunks in order"""
+        mock_provider = MagicMock()
+        mock_provider.max_context_chars = 80000
+        mock_provider.stream_logs.return_value = iter(["The build ", "failed."])
+        self.mock_get_provider.return_value = mock_provider
+        
+        agent = AIAnalysisAgent(api_key="test_key", provider="openai")
+        
+        chunks = list(agent.stream_logs("Sample log content", "What went wrong?"))
+        
+        self.assertEqual(chunks, ["The build ", "failed."])
+        mock_provider.stream_logs.assert_called_once_with("Sample log content", "What went wrong?")
+
+    def test_truncate_logs(self):
+        """Test that oversized logs keep earlier error lines and the log tail"""
+        self.mock_provider.max_context_chars = 80000
+        logs = "\n".join(
+            ["step output"] * 500
+            + ["##[error] Restore failed: package not found"]
+            + ["step output"] * 5000
+            + ["Build FAILED at the end"]
+        )
+        
+        trimmed = self.agent._truncate_logs(logs, max_chars=1000)
+        
+        self.assertLessEqual(len(trimmed), 1000)
+        self.assertTrue(trimmed.startswith("##[error] Restore failed: package not found"))
+        self.assertTrue(trimmed.endswith("Build FAILED at the end"))
+        self.assertEqual(self.agent._truncate_logs("short log", max_chars=1000), "short log")
+
+class TestProviderStreamErrors(unittest.TestCase):
+    def setUp(self):
+        def completion():
+            yield Mock(choices=[Mock(delta=Mock(content="The build failed because"))])
+            raise TimeoutError("read timeout")
+        
+        self.provider = OpenAIProvider(api_key="test_key", model="gpt-4o")
+        self.provider.client = MagicMock()
+        self.provider.client.chat.completions.create.side_effect = lambda **kwargs: completion()
+    
+    def test_analyze_logs_returns_only_the_error(self):
+        """Test that a stream failing partway is not joined with its partial text"""
+        result = self.provider.analyze_logs("Sample log content", "What went wrong?")
+        
+        self.assertEqual(result, "Error analyzing logs with OpenAI: read timeout")
+    
+    def test_stream_logs_ends_with_the_error(self):
+        """Test that streaming consumers still see the partial text and then the error"""
+        chunks = list(self.provider.stream_logs("Sample log content", "What went wrong?"))
+        
+        self.assertEqual(chunks, ["The build failed because", "Error analyzing logs with OpenAI: read timeout"])
+
+class TestBatchingAnalyzer(unittest.TestCase):
+    def test_collector_exits_when_idle(self):
+        """Test that the collector task stops once the queue is drained and restarts on submit"""
+        client = MagicMock()
+        client.chat.completions.create = AsyncMock(side_effect=lambda model, messages: messages[0]["content"])
+        batcher = BatchingAnalyzer(client)
+        
+        async def run():
+            first = await asyncio.gather(batcher._submit("gpt-4o", "a"), batcher._submit("gpt-4o", "b"))
+            idle = batcher._collector is None
+            second = await batcher._submit("gpt-4o", "c")
+            return first, idle, second
+        
+        first, idle, second = asyncio.run(run())
+        
+        self.assertEqual(first, ["a", "b"])
+        self.assertTrue(idle)
+        self.assertEqual(second, "c")
+        self.assertIsNone(batcher._collector)
+        self.assertEqual(client.chat.completions.create.await_count, 3)
 
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
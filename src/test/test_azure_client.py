@@ -1,68 +1,193 @@
+import asyncio
 import unittest
-from unittest.mock import patch, MagicMock
-import json
+from unittest.mock import Mock, patch
+import httpx
 from src.agent.azure_client import AzureDevOpsClient
+from src.agent.ai_agent import AIAnalysisAgent
+from src.test._fixtures import AZURE_DEVOPS_BUILD_URL, TFS_BUILD_URL, fake_response, parse_url
 
+# Retry backoff must never slow the suite down
+@patch('time.sleep', lambda *_: None)
 class TestAzureDevOpsClient(unittest.TestCase):
     def setUp(self):
+        # Fail fast on any real network access instead of hanging on DNS or connect
+        no_network = AssertionError("no network in unit tests")
+        for target in ('socket.getaddrinfo', 'socket.socket.connect'):
+            patcher = patch(target, side_effect=no_network)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        
         self.client = AzureDevOpsClient("dummy_pat", "dummy_org")
         
-    def test_url_parser_tfs(self):
-        """Test URL parsing for TFS URLs"""
-        url = "https://azure.asax.ir/tfs/AsaProjects/CustomerDevelopment/_build/results?buildId=868491&view=logs&j=c6dc1ccb-b334-5d4e-8705-9a961a97b18b&t=0ada1057-2299-54a0-1d11-75e5dcfc5f1c"
+    def test_url_parser(self):
+        """Test URL parsing for TFS and Azure DevOps URLs"""
+        cases = [
+            (
+                TFS_BUILD_URL,
+                {
+                    "build_id": 868491,
+                    "project": "CustomerDevelopment",
+                    "job_id": "c6dc1ccb-b334-5d4e-8705-9a961a97b18b",
+                    "task_id": "0ada1057-2299-54a0-1d11-75e5dcfc5f1c"
+                }
+            ),
+            (
+                AZURE_DEVOPS_BUILD_URL,
+                {"build_id": 12345, "project": "myproject"}
+            ),
+        ]
+        
+        for url, expected in cases:
+            with self.subTest(url=url):
+                # URL parsing keeps no state, so each URL is parsed once per run
+                result = parse_url(url)
+                
+                self.assertIsNotNone(result)
+                for key, value in expected.items():
+                    self.assertEqual(result[key], value)
         
-        result = self.client.parse_azure_devops_url(url)
+    def test_get_build_logs(self):
+        """Test retrieving build logs"""
+        # Configure mock to return the build details, then the logs list
+        patcher = patch.object(self.client._session, 'get')
+        mock_get = patcher.start()
+        self.addCleanup(patcher.stop)
+        mock_get.side_effect = [
+            fake_response({"id": 12345, "status": "completed"}),
+            fake_response({"value": [{"id": 1, "name": "Log 1"}, {"id": 2, "name": "Log 2"}]})
+        ]
         
-        self.assertIsNotNone(result)
-        self.assertEqual(result["build_id"], 868491)
-        self.assertEqual(result["project"], "CustomerDevelopment")
-        self.assertEqual(result["job_id"], "c6dc1ccb-b334-5d4e-8705-9a961a97b18b")
-        self.assertEqual(result["task_id"], "0ada1057-2299-54a0-1d11-75e5dcfc5f1c")
+        # Log contents are fetched concurrently through the async client
+        requested_logs = []
+        def handle_log_request(request):
+            log_id = request.url.path.rsplit("/", 1)[-1]
+            requested_logs.append(log_id)
+            return httpx.Response(200, text=f"Log {log_id} content")
         
-    def test_url_parser_azure_devops(self):
-        """Test URL parsing for Azure DevOps URLs"""
-        url = "https://dev.azure.com/myorg/myproject/_build/results?buildId=12345"
+        transport = httpx.MockTransport(handle_log_request)
+        async_patcher = patch.object(
+            self.client, '_make_async_client',
+            lambda: httpx.AsyncClient(transport=transport)
+        )
+        async_patcher.start()
+        self.addCleanup(async_patcher.stop)
         
-        result = self.client.parse_azure_devops_url(url)
+        # Test
+        url_info = {
+            "type": "build",
+            "base_url": "https://dev.azure.com/myorg",
+            "project": "myproject",
+            "build_id": 12345
+        }
         
-        self.assertIsNotNone(result)
-        self.assertEqual(result["build_id"], 12345)
-        self.assertEqual(result["project"], "myproject")
+        result = self.client.get_build_logs(url_info)
         
-    @patch('requests.get')
-    def test_get_build_logs(self, mock_get):
-        """Test retrieving build logs"""
-        # Setup mock responses
-        build_response = MagicMock()
-        build_response.status_code = 200
-        build_response.json.return_value = {"id": 12345, "status": "completed"}
-        
-        logs_list_response = MagicMock()
-        logs_list_response.status_code = 200
-        logs_list_response.json.return_value = {
-            "value": [
-                {"id": 1, "name": "Log 1"},
-                {"id": 2, "name": "Log 2"}
-            ]
+        # Verify
+        self.assertIn("Log 1 content", result)
+        self.assertIn("Log 2 content", result)
+        self.assertLess(result.index("Log 1 content"), result.index("Log 2 content"))
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(sorted(requested_logs), ["1", "2"])
+
+    def test_get_build_logs_build_error(self):
+        """Test that a failed build details request is reported with its status code"""
+        url_info = {
+            "type": "build",
+            "base_url": "https://dev.azure.com/myorg",
+            "project": "myproject",
+            "build_id": 12345
         }
         
-        log1_response = MagicMock()
-        log1_response.status_code = 200
-        log1_response.text = "Log 1 content"
+        with patch.object(self.client._session, 'get', return_value=fake_response(text="Server error", status=500)):
+            result = self.client.get_build_logs(url_info)
+        
+        self.assertEqual(result, "Failed to get build details: 500")
+
+    def test_aget_build_logs(self):
+        """Test retrieving build logs through the async client"""
+        def handle_request(request):
+            path = request.url.path
+            if path.endswith("/logs"):
+                return httpx.Response(200, json={"value": [{"id": 1}, {"id": 2}]})
+            if "/logs/" in path:
+                return httpx.Response(200, text=f"Log {path.rsplit('/', 1)[-1]} content")
+            return httpx.Response(200, json={"id": 12345, "status": "completed"})
+        
+        transport = httpx.MockTransport(handle_request)
+        url_info = {
+            "type": "build",
+            "base_url": "https://dev.azure.com/myorg",
+            "project": "myproject",
+            "build_id": 12345
+        }
         
-        log2_response = MagicMock()
-        log2_response.status_code = 200
-        log2_response.text = "Log 2 content"
+        with patch.object(self.client, '_make_async_client', lambda: httpx.AsyncClient(transport=transport)):
+            result = asyncio.run(self.client.aget_build_logs(url_info))
         
-        # Configure mock to return different responses
+        self.assertIn("Log 1 content", result)
+        self.assertIn("Log 2 content", result)
+        self.assertLess(result.index("Log 1 content"), result.index("Log 2 content"))
+
+    def test_aget_build_logs_max_chars(self):
+        """Test that no more than the character budget is returned"""
+        def handle_request(request):
+            path = request.url.path
+            if path.endswith("/logs"):
+                return httpx.Response(200, json={"value": [{"id": 1}, {"id": 2}]})
+            if "/logs/" in path:
+                return httpx.Response(200, text="x" * 1000)
+            return httpx.Response(200, json={"id": 12345, "status": "completed"})
+
+        transport = httpx.MockTransport(handle_request)
+        url_info = {
+            "type": "build",
+            "base_url": "https://dev.azure.com/myorg",
+            "project": "myproject",
+            "build_id": 12345
+        }
+
+        with patch.object(self.client, '_make_async_client', lambda: httpx.AsyncClient(transport=transport)):
+            result = asyncio.run(self.client.aget_build_logs(url_info, max_chars=100))
+
+        self.assertEqual(result, "x" * 100)
+
+    def test_get_build_logs_keeps_log_end(self):
+        """Test that the failure at the end of a large log survives download and prompt trimming"""
+        bodies = {
+            "1": "error: early restore warning\n" + "step output\n" * 20000,
+            "2": "step output\n" * 20000 + "##[error] Build FAILED\n",
+        }
+        patcher = patch.object(self.client._session, 'get')
+        mock_get = patcher.start()
+        self.addCleanup(patcher.stop)
         mock_get.side_effect = [
-            build_response,
-            logs_list_response,
-            log1_response,
-            log2_response
+            fake_response({"id": 12345, "status": "completed"}),
+            fake_response({"value": [{"id": 1}, {"id": 2}]})
         ]
+        transport = httpx.MockTransport(
+            lambda request: httpx.Response(200, text=bodies[request.url.path.rsplit("/", 1)[-1]])
+        )
+        async_patcher = patch.object(self.client, '_make_async_client', lambda: httpx.AsyncClient(transport=transport))
+        async_patcher.start()
+        self.addCleanup(async_patcher.stop)
         
-        # Test
+        with patch('src.agent.ai_agent.get_cached_ai_provider', return_value=Mock(max_context_chars=500)):
+            agent = AIAnalysisAgent(api_key="test_key", provider="openai")
+            window = agent.log_window_chars
+            logs = self.client.get_build_logs(
+                {"type": "build", "base_url": "https://dev.azure.com/myorg", "project": "myproject", "build_id": 12345},
+                max_chars=window
+            )
+            trimmed = agent._truncate_logs(logs)
+        
+        self.assertEqual(window, 1000)
+        self.assertLessEqual(len(logs), window)
+        self.assertTrue(logs.endswith("##[error] Build FAILED\n"))
+        self.assertLessEqual(len(trimmed), 500)
+        self.assertTrue(trimmed.endswith("##[error] Build FAILED\n"))
+
+    def test_get_build_logs_cached(self):
+        """Test that build logs are cached per build and errors are not"""
         url_info = {
             "type": "build",
             "base_url": "https://dev.azure.com/myorg",
@@ -70,11 +195,79 @@ class TestAzureDevOpsClient(unittest.TestCase):
             "build_id": 12345
         }
         
-        result = self.client.get_build_logs(url_info)
+        with patch.object(self.client, '_fetch_build_logs') as mock_fetch:
+            mock_fetch.side_effect = [
+                ("Failed to get build details: 500", False), ("Log content", True), ("Fresh log content", True)
+            ]
+            
+            self.assertEqual(self.client.get_build_logs(url_info), "Failed to get build details: 500")
+            self.assertEqual(self.client.get_build_logs(url_info), "Log content")
+            self.assertEqual(self.client.get_build_logs(url_info), "Log content")
+            self.assertEqual(self.client.get_build_logs(url_info, force_refresh=True), "Fresh log content")
+            self.assertEqual(mock_fetch.call_count, 3)
+
+    def test_get_build_logs_cached_per_project(self):
+        """Test that the same build ID in different projects is cached separately"""
+        url_info = {
+            "type": "build",
+            "base_url": "https://dev.azure.com/myorg",
+            "project": "myproject",
+            "build_id": 12345
+        }
+        other_info = dict(url_info, project="otherproject")
         
-        # Verify
-        self.assertIn("Log 1 content", result)
-        self.assertIn("Log 2 content", result)
+        with patch.object(self.client, '_fetch_build_logs') as mock_fetch:
+            mock_fetch.side_effect = [("Log content", True), ("Other log content", True)]
+            
+            self.assertEqual(self.client.get_build_logs(url_info), "Log content")
+            self.assertEqual(self.client.get_build_logs(other_info), "Other log content")
+            self.assertEqual(self.client.get_build_logs(url_info), "Log content")
+            self.assertEqual(mock_fetch.call_count, 2)
+    
+    def test_get_build_logs_cached_across_windows(self):
+        """Test that cached logs serve a smaller window and a larger one is fetched again"""
+        url_info = {
+            "type": "build",
+            "base_url": "https://dev.azure.com/myorg",
+            "project": "myproject",
+            "build_id": 12345
+        }
+        logs = "".join(f"line {i}\n" for i in range(100))
+        
+        with patch.object(self.client, '_fetch_build_logs') as mock_fetch:
+            mock_fetch.side_effect = [(logs, True), ("Larger log content", True)]
+            
+            self.assertEqual(self.client.get_build_logs(url_info, max_chars=1000), logs)
+            self.assertEqual(self.client.get_build_logs(url_info, max_chars=20), "line 98\nline 99\n")
+            self.assertEqual(self.client.get_build_logs(url_info, max_chars=2000), "Larger log content")
+            self.assertEqual(mock_fetch.call_count, 2)
+    
+    def test_running_build_logs_not_cached(self):
+        """Test that logs of a build that has not completed are fetched again"""
+        url_info = {
+            "type": "build",
+            "base_url": "https://dev.azure.com/myorg",
+            "project": "myproject",
+            "build_id": 12345
+        }
+        patcher = patch.object(self.client._session, 'get')
+        mock_get = patcher.start()
+        self.addCleanup(patcher.stop)
+        mock_get.side_effect = [
+            fake_response({"id": 12345, "status": "inProgress"}),
+            fake_response({"value": [{"id": 1}]}),
+            fake_response({"id": 12345, "status": "completed"}),
+            fake_response({"value": [{"id": 1}]}),
+        ]
+        contents = iter(["Partial log", "Full log"])
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, text=next(contents)))
+        async_patcher = patch.object(self.client, '_make_async_client', lambda: httpx.AsyncClient(transport=transport))
+        async_patcher.start()
+        self.addCleanup(async_patcher.stop)
+        
+        self.assertEqual(self.client.get_build_logs(url_info), "Partial log")
+        self.assertEqual(self.client.get_build_logs(url_info), "Full log")
+        self.assertEqual(self.client.get_build_logs(url_info), "Full log")
         self.assertEqual(mock_get.call_count, 4)
 
 if __name__ == '__main__':
@@ -1,91 +1,246 @@
+import asyncio
+import copy
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, AsyncMock, MagicMock, Mock
+from cachetools import TTLCache
 from src.agent.devops_agent import DevOpsAgent
+import src.agent.ai_providers as ai_providers
+from src.agent.ai_providers import get_cached_ai_provider
+from src.test._fixtures import parse_url
 
 class TestDevOpsAgent(unittest.TestCase):
-    @patch('src.agent.ai_providers.get_ai_provider')
-    def setUp(self, mock_get_provider):
-        # Setup mock provider
+    @classmethod
+    def setUpClass(cls):
+        cls._template_agent = DevOpsAgent()
+    
+    def setUp(self):
+        # Providers are cached per process; start every test without them
+        get_cached_ai_provider.cache_clear()
+        self.addCleanup(get_cached_ai_provider.cache_clear)
+        
+        # Setup mock provider; it is built on first use, so swap the factory for
+        # the whole test (a plain attribute swap is much cheaper than mock.patch)
         self.mock_provider = MagicMock()
-        mock_get_provider.return_value = self.mock_provider
+        self.mock_provider.max_context_chars = 80000
+        self.addCleanup(setattr, ai_providers, 'get_ai_provider', ai_providers.get_ai_provider)
+        ai_providers.get_ai_provider = lambda *args, **kwargs: self.mock_provider
         
-        self.agent = DevOpsAgent()
+        # Build the agent once per class; each test gets a copy with its own
+        # provider selection and analysis cache
+        self.agent = copy.copy(self._template_agent)
+        self.agent.ai_agent = copy.copy(self._template_agent.ai_agent)
+        self.agent._analysis_cache = TTLCache(maxsize=16, ttl=60)
+        
+        # Stub the Azure DevOps client with only the methods the agent calls;
+        # URLs are really parsed unless a test overrides it
+        self.agent.azure_client = Mock(spec_set=['parse_azure_devops_url', 'get_build_logs'])
+        self.agent.azure_client.parse_azure_devops_url.side_effect = parse_url
+        self.agent.azure_client.get_build_logs.return_value = "Sample log content"
+    
+    def _stub_parse_url(self, url_info):
+        """Make the agent's client parse every URL to url_info."""
+        mock_parse_url = self.agent.azure_client.parse_azure_devops_url
+        mock_parse_url.side_effect = None
+        mock_parse_url.return_value = url_info
+        return mock_parse_url
     
-    @patch('src.agent.azure_client.AzureDevOpsClient.get_build_logs')
-    def test_process_request(self, mock_get_build_logs):
+    def test_process_request(self):
         """Test the process_request method with mocked dependencies"""
         # Setup mocks
-        mock_get_build_logs.return_value = "Sample log content"
         self.mock_provider.analyze_logs.return_value = "Analysis result"
         
-        # Patch the parse_azure_devops_url method
-        with patch.object(self.agent.azure_client, 'parse_azure_devops_url') as mock_parse_url:
-            mock_parse_url.return_value = {
-                "type": "build",
-                "base_url": "https://azure.asax.ir/tfs",
-                "project": "CustomerDevelopment",
-                "build_id": 868491,
-                "job_id": "c6dc1ccb-b334-5d4e-8705-9a961a97b18b",
-                "task_id": "0ada1057-2299-54a0-1d11-75e5dcfc5f1c"
-            }
-            
-            # Test with URL and query
-            result = self.agent.process_request(
-                "https://azure.asax.ir/tfs/AsaProjects/CustomerDevelopment/_build/results?buildId=868491 What's the error?",
-                "test_user_123"
-            )
-            
-            # Assert the result
-            self.assertEqual(result, "Analysis result")
-            
-            # Assert the mocks were called correctly
-            mock_parse_url.assert_called_once()
-            mock_get_build_logs.assert_called_once()
-            self.mock_provider.analyze_logs.assert_called_once()
+        # Stub the parse_azure_devops_url method
+        mock_parse_url = self._stub_parse_url({
+            "type": "build",
+            "base_url": "https://azure.asax.ir/tfs",
+            "project": "CustomerDevelopment",
+            "build_id": 868491,
+            "job_id": "c6dc1ccb-b334-5d4e-8705-9a961a97b18b",
+            "task_id": "0ada1057-2299-54a0-1d11-75e5dcfc5f1c"
+        })
+        
+        # Test with URL and query
+        result = self.agent.process_request(
+            "https://azure.asax.ir/tfs/AsaProjects/CustomerDevelopment/_build/results?buildId=868491 What's the error?",
+            "test_user_123"
+        )
+        
+        # Assert the result
+        self.assertEqual(result, "Analysis result")
+        
+        # Assert the mocks were called correctly
+        mock_parse_url.assert_called_once()
+        self.agent.azure_client.get_build_logs.assert_called_once()
+        self.mock_provider.analyze_logs.assert_called_once()
+    
+    def test_process_request_url_after_text(self):
+        """Test that the question is taken from after the URL wherever it appears"""
+        self.mock_provider.analyze_logs.return_value = "Analysis result"
+        
+        self.agent.process_request(
+            "Please check https://dev.azure.com/org/project/_build/results?buildId=123 What's the error?",
+            "test_user"
+        )
+        
+        self.mock_provider.analyze_logs.assert_called_once_with("Sample log content", "What's the error?")
+    
+    def test_process_request_full_url_wins_over_fragment(self):
+        """Test that a full URL is used even when a bare buildId fragment comes first"""
+        self.mock_provider.analyze_logs.return_value = "Analysis result"
+        
+        self.agent.process_request(
+            "Is buildId=99 related? https://dev.azure.com/org/project/_build/results?buildId=123 What's the error?",
+            "test_user"
+        )
+        
+        url_info = self.agent.azure_client.get_build_logs.call_args.args[0]
+        self.assertEqual((url_info["project"], url_info["build_id"]), ("project", 123))
+        self.mock_provider.analyze_logs.assert_called_once_with("Sample log content", "What's the error?")
+    
+    def test_process_parsed(self):
+        """Test processing a request whose URL and question are already separate"""
+        self.mock_provider.analyze_logs.return_value = "Analysis result"
+        
+        result = self.agent.process_parsed(
+            "https://dev.azure.com/org/project/_build/results?buildId=123", "  ", "test_user"
+        )
+        
+        self.assertEqual(result, "Analysis result")
+        self.mock_provider.analyze_logs.assert_called_once_with(
+            "Sample log content", "What caused this build to fail and how can I fix it?"
+        )
+        self.assertIn("I couldn't find a valid Azure DevOps URL", self.agent.process_parsed("", "Why?", "test_user"))
+        
+        # A JSON body may carry "query": null
+        self.agent.process_parsed("https://dev.azure.com/org/project/_build/results?buildId=123", None, "test_user")
+        self.mock_provider.analyze_logs.assert_called_with(
+            "Sample log content", "What caused this build to fail and how can I fix it?"
+        )
     
     def test_process_request_no_url(self):
         """Test process_request with no URL provided"""
         result = self.agent.process_request("There is no URL here", "test_user")
         self.assertIn("I couldn't find a valid Azure DevOps URL", result)
     
-    @patch('src.agent.azure_client.AzureDevOpsClient.parse_azure_devops_url')
-    def test_process_request_invalid_url(self, mock_parse_url):
+    def test_process_request_invalid_url(self):
         """Test process_request with invalid URL"""
-        mock_parse_url.return_value = {}
+        self._stub_parse_url({})
         
         result = self.agent.process_request("https://example.com invalid URL", "test_user")
         self.assertIn("I couldn't parse that Azure DevOps URL", result)
     
-    @patch('src.agent.azure_client.AzureDevOpsClient.get_build_logs')
     @patch('src.agent.ai_agent.AIAnalysisAgent.change_provider')
-    def test_process_request_with_provider(self, mock_change_provider, mock_get_build_logs):
+    def test_process_request_with_provider(self, mock_change_provider):
         """Test process_request with provider selection"""
         # Setup mocks
-        mock_get_build_logs.return_value = "Sample log content"
         self.mock_provider.analyze_logs.return_value = "Analysis with custom provider"
         
-        # Patch the parse_azure_devops_url method
-        with patch.object(self.agent.azure_client, 'parse_azure_devops_url') as mock_parse_url:
-            mock_parse_url.return_value = {
-                "type": "build",
-                "base_url": "https://dev.azure.com/org",
-                "project": "project",
-                "build_id": 123
-            }
-            
-            # Test with URL, query, and provider selection
-            result = self.agent.process_request(
-                "https://dev.azure.com/org/project/_build/results?buildId=123 What's wrong?",
-                "test_user",
-                provider="gemini",
-                model="gemini-1.5-pro"
-            )
-            
-            # Assert the change_provider was called
-            mock_change_provider.assert_called_once_with("gemini", "gemini-1.5-pro")
-            
-            # Assert the result
-            self.assertEqual(result, "Analysis with custom provider")
+        # Stub the parse_azure_devops_url method
+        mock_parse_url = self._stub_parse_url({
+            "type": "build",
+            "base_url": "https://dev.azure.com/org",
+            "project": "project",
+            "build_id": 123
+        })
+        
+        # Test with URL, query, and provider selection
+        result = self.agent.process_request(
+            "https://dev.azure.com/org/project/_build/results?buildId=123 What's wrong?",
+            "test_user",
+            provider="gemini",
+            model="gemini-1.5-pro"
+        )
+        
+        # Assert the change_provider was called
+        mock_change_provider.assert_called_once_with("gemini", "gemini-1.5-pro")
+        
+        # Assert the result
+        self.assertEqual(result, "Analysis with custom provider")
+    
+    def test_provider_creation_error_is_reported(self):
+        """Test that a provider that cannot be created yields the usual analysis error"""
+        def fail(*args, **kwargs):
+            raise ValueError("Missing credentials")
+        ai_providers.get_ai_provider = fail
+        self.agent.azure_client = Mock(spec_set=['parse_azure_devops_url', 'get_build_logs', 'aget_build_logs'])
+        self.agent.azure_client.parse_azure_devops_url.side_effect = parse_url
+        self.agent.azure_client.get_build_logs.return_value = "Sample log content"
+        self.agent.azure_client.aget_build_logs = AsyncMock(return_value="Sample log content")
+        url = "https://dev.azure.com/org/project/_build/results?buildId=123"
+        
+        self.assertEqual(self.agent.process_parsed(url, "Why?", "test_user"), "Error analyzing logs: Missing credentials")
+        self.assertEqual(
+            asyncio.run(self.agent.aprocess_parsed(url, "Why?", "test_user")),
+            "Error analyzing logs: Missing credentials"
+        )
+        self.assertEqual(self.agent.azure_client.get_build_logs.call_args.kwargs["max_chars"], 131072)
+
+class TestDevOpsAgentAnalysisCache(unittest.TestCase):
+    def setUp(self):
+        get_cached_ai_provider.cache_clear()
+        self.addCleanup(get_cached_ai_provider.cache_clear)
+        
+        self.mock_provider = MagicMock()
+        self.mock_provider.max_context_chars = 80000
+        self.addCleanup(setattr, ai_providers, 'get_ai_provider', ai_providers.get_ai_provider)
+        ai_providers.get_ai_provider = lambda *args, **kwargs: self.mock_provider
+        
+        self.agent = DevOpsAgent()
+        self.agent.azure_client.get_build_logs = MagicMock(return_value="Sample log content")
+    
+    def test_repeated_request_uses_cached_analysis(self):
+        """Test that an identical request is answered without calling the provider again"""
+        self.mock_provider.analyze_logs.side_effect = ["Analysis result", "Second analysis"]
+        text = "https://dev.azure.com/org/project/_build/results?buildId=123 What's wrong?"
+        
+        self.assertEqual(self.agent.process_request(text, "test_user"), "Analysis result")
+        self.assertEqual(self.agent.process_request(text, "test_user"), "Analysis result")
+        self.assertEqual(self.mock_provider.analyze_logs.call_count, 1)
+        
+        # A different question is analyzed again
+        self.assertEqual(self.agent.process_request(text + " Again?", "test_user"), "Second analysis")
+    
+    def test_errors_are_not_cached(self):
+        """Test that failed analyses are retried on the next request"""
+        self.mock_provider.analyze_logs.side_effect = ["Error analyzing logs with OpenAI: timeout", "Analysis result"]
+        text = "https://dev.azure.com/org/project/_build/results?buildId=123 What's wrong?"
+        
+        self.agent.process_request(text, "test_user")
+        self.assertEqual(self.agent.process_request(text, "test_user"), "Analysis result")
+        self.assertEqual(self.mock_provider.analyze_logs.call_count, 2)
+    
+    def test_failed_stream_is_not_cached(self):
+        """Test that a stream that fails partway is analyzed again on the next request"""
+        self.mock_provider.stream_logs.side_effect = [
+            iter(["The build failed because", "Error analyzing logs with OpenAI: read timeout"]),
+            iter(["Analysis result"]),
+        ]
+        text = "https://dev.azure.com/org/project/_build/results?buildId=123 What's wrong?"
+        
+        list(self.agent.stream_request(text, "test_user"))
+        self.assertEqual("".join(self.agent.stream_request(text, "test_user")), "Analysis result")
+        self.assertEqual(self.mock_provider.stream_logs.call_count, 2)
+    
+    def test_provider_switch_during_request(self):
+        """Test that a provider switch by a concurrent request changes neither the analysis nor its cache key"""
+        providers = {}
+        for name in ("openai", "gemini"):
+            providers[name] = MagicMock(max_context_chars=80000)
+            providers[name].analyze_logs.return_value = f"{name} analysis"
+        ai_providers.get_ai_provider = lambda provider_name, model=None: providers[provider_name]
+        
+        def get_build_logs(*args, **kwargs):
+            if self.agent.azure_client.get_build_logs.call_count == 1:
+                # Another request selects a different provider meanwhile
+                self.agent._select_provider("gemini", "gemini-1.5-pro")
+            return "Sample log content"
+        self.agent.azure_client.get_build_logs = MagicMock(side_effect=get_build_logs)
+        text = "https://dev.azure.com/org/project/_build/results?buildId=123 What's wrong?"
+        
+        self.assertEqual(self.agent.process_request(text, "test_user", provider="openai"), "openai analysis")
+        self.assertEqual(self.agent.process_request(text, "test_user", provider="gemini"), "gemini analysis")
+        self.assertEqual(self.agent.process_request(text, "test_user", provider="openai"), "openai analysis")
+        self.assertEqual(providers["openai"].analyze_logs.call_count, 1)
 
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
@@ -0,0 +1,55 @@
+import unittest
+from src.api.events import EventBus, sse_frame
+
+class TestEventBus(unittest.TestCase):
+    def setUp(self):
+        self.bus = EventBus(queue_size=8)
+        
+    def test_publish_fans_out_same_frame(self):
+        """Test that one published event reaches every subscriber as the same bytes"""
+        first = self.bus.subscribe("s1")
+        second = self.bus.subscribe("s1")
+        
+        self.bus.publish("s1", {"status": "parsing"})
+        
+        frame = first.get_nowait()
+        self.assertEqual(frame, sse_frame({"status": "parsing"}))
+        self.assertIs(second.get_nowait(), frame)
+        
+    def test_late_subscriber_replays_history(self):
+        """Test that a subscriber joining after close gets the missed frames and the end of stream"""
+        self.bus.open("s1")
+        self.bus.publish("s1", {"status": "parsing"})
+        self.bus.close("s1", {"status": "complete"})
+        
+        q = self.bus.subscribe("s1")
+        
+        self.assertEqual(q.get_nowait(), sse_frame({"status": "parsing"}))
+        self.assertEqual(q.get_nowait(), sse_frame({"status": "complete"}))
+        self.assertIsNone(q.get_nowait())
+        self.assertTrue(self.bus.is_closed("s1"))
+        
+    def test_finished_run_is_not_replayed_to_next_run(self):
+        """Test that a subscriber arriving before the next run is opened waits for that run"""
+        first = self.bus.subscribe("s1")
+        self.bus.open("s1")
+        self.bus.publish("s1", {"status": "result", "result": "RESULT1"})
+        self.bus.close("s1", {"status": "complete"})
+        self.assertEqual(first.qsize(), 3)
+        
+        # The next submission's stream connects before its POST opens the run
+        second = self.bus.subscribe("s1")
+        self.assertTrue(second.empty())
+        self.bus.open("s1")
+        self.bus.publish("s1", {"status": "result", "result": "RESULT2"})
+        
+        self.assertEqual(second.get_nowait(), sse_frame({"status": "result", "result": "RESULT2"}))
+        
+    def test_publish_without_channel_is_dropped(self):
+        """Test that events for unknown sessions are not kept"""
+        self.bus.publish("unknown", {"status": "parsing"})
+        
+        self.assertTrue(self.bus.is_closed("unknown"))
+
+if __name__ == '__main__':
+    unittest.main() 
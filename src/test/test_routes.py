@@ -0,0 +1,94 @@
+import threading
+import unittest
+from unittest.mock import patch
+import orjson
+from src.api import routes
+
+URL = "https://dev.azure.com/org/project/_build/results?buildId=123"
+QUERY = "What's wrong?"
+
+class TestProcessOnce(unittest.TestCase):
+    def setUp(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.outcomes = {}
+        
+        patcher = patch.object(routes.devops_agent, 'process_parsed')
+        self.process_parsed = patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def _call(self, name):
+        """Run _process_once in a thread, recording its result or exception under name."""
+        def run():
+            try:
+                self.outcomes[name] = routes._process_once(URL, QUERY, name, "openai", "gpt-4o")
+            except Exception as e:
+                self.outcomes[name] = e
+        thread = threading.Thread(target=run)
+        thread.start()
+        return thread
+    
+    def _run_leader_and_waiter(self):
+        leader = self._call("leader")
+        self.assertTrue(self.started.wait(5))
+        waiter = self._call("waiter")
+        # The waiter blocks on the leader's future until the leader finishes
+        waiter.join(0.2)
+        self.assertTrue(waiter.is_alive())
+        self.release.set()
+        leader.join(5)
+        waiter.join(5)
+    
+    def _blocking(self, outcome):
+        def side_effect(*args):
+            self.started.set()
+            self.release.wait(5)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+        return side_effect
+    
+    def test_identical_request_waits_for_leader(self):
+        """Test that a concurrent identical request gets the leader's result without processing again"""
+        self.process_parsed.side_effect = self._blocking("Analysis result")
+        
+        self._run_leader_and_waiter()
+        
+        self.assertEqual(self.outcomes, {"leader": "Analysis result", "waiter": "Analysis result"})
+        self.process_parsed.assert_called_once_with(URL, QUERY, "leader", "openai", "gpt-4o")
+        self.assertEqual(routes._INFLIGHT, {})
+    
+    def test_exception_reaches_waiter(self):
+        """Test that the leader's exception is raised in the waiter and the entry is removed"""
+        error = RuntimeError("Azure DevOps unavailable")
+        self.process_parsed.side_effect = self._blocking(error)
+        
+        self._run_leader_and_waiter()
+        
+        self.assertIs(self.outcomes["leader"], error)
+        self.assertIs(self.outcomes["waiter"], error)
+        self.assertEqual(self.process_parsed.call_count, 1)
+        self.assertEqual(routes._INFLIGHT, {})
+
+class TestBackgroundProcessing(unittest.TestCase):
+    def setUp(self):
+        self.client = routes.app.test_client()
+        
+        patcher = patch.object(routes.devops_agent, 'process_parsed', side_effect=RuntimeError("Azure DevOps unavailable"))
+        self.process_parsed = patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def test_agent_error_reaches_the_page(self):
+        """Test that an exception in the background worker is published before the stream completes"""
+        response = self.client.post('/', data={"url": URL, "query": QUERY, "session_id": "s-error"})
+        self.assertEqual(response.status_code, 202)
+        
+        body = self.client.get('/stream-progress/s-error').get_data()
+        events = [orjson.loads(line[len(b"data: "):]) for line in body.split(b"\n\n") if line.startswith(b"data: ")]
+        
+        self.assertIn({"status": "error", "message": "Error processing request: Azure DevOps unavailable"}, events)
+        self.assertEqual(events[-1]["status"], "complete")
+        self.assertNotIn("result", [event["status"] for event in events])
+
+if __name__ == '__main__':
+    unittest.main() 
@@ -0,0 +1,63 @@
+import contextlib
+import importlib.util
+import io
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+from compile_settings import compile_settings
+from src.config import settings
+
+class TestCompiledSettings(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.env_path = os.path.join(tmp.name, ".env")
+        with open(self.env_path, "w") as f:
+            f.write("AIOPS_TEST_SETTING=compiled\n")
+        
+        output = os.path.join(tmp.name, "_settings_compiled.py")
+        with contextlib.redirect_stdout(io.StringIO()):
+            compile_settings(self.env_path, output=output)
+        spec = importlib.util.spec_from_file_location("src.config._settings_compiled", output)
+        compiled = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(compiled)
+        
+        # Serve the temporary module in place of any real compiled settings
+        for patcher in (
+            patch.dict(sys.modules, {"src.config._settings_compiled": compiled}),
+            patch.dict(os.environ),
+            patch.object(settings, "load_dotenv"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        os.environ.pop("AIOPS_TEST_SETTING", None)
+    
+    def test_values_load_from_compiled_module(self):
+        """Test that current compiled values are applied without parsing .env"""
+        settings._load_env()
+        
+        self.assertEqual(os.environ["AIOPS_TEST_SETTING"], "compiled")
+        settings.load_dotenv.assert_not_called()
+    
+    def test_edited_env_falls_back_to_dotenv(self):
+        """Test that stale compiled values are ignored once .env changes"""
+        with open(self.env_path, "a") as f:
+            f.write("AIOPS_OTHER_SETTING=new\n")
+        
+        settings._load_env()
+        
+        settings.load_dotenv.assert_called_once_with()
+        self.assertNotIn("AIOPS_TEST_SETTING", os.environ)
+    
+    def test_preset_variable_is_kept(self):
+        """Test that compiled values never override variables already in the environment"""
+        os.environ["AIOPS_TEST_SETTING"] = "preset"
+        
+        settings._load_env()
+        
+        self.assertEqual(os.environ["AIOPS_TEST_SETTING"], "preset")
+
+if __name__ == '__main__':
+    unittest.main() 
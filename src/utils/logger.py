@@ -1,17 +1,31 @@
 import logging
+import logging.handlers
+import os
 import sys
 
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
 def setup_logging(level=logging.INFO):
-    """Set up logging for the application."""
+    """Set up logging for the application; later calls return the logger without reconfiguring."""
+    if getattr(setup_logging, "_done", False):
+        return logging.getLogger(__name__)
+    
+    handlers = [logging.StreamHandler(sys.stdout)]
+    
+    # Also write to a file only when AIOPS_LOG_FILE names one. The file is opened
+    # on the first write; records are buffered and written in batches,
+    # immediately for errors
+    log_file = os.environ.get("AIOPS_LOG_FILE")
+    if log_file:
+        file_handler = logging.FileHandler(log_file, delay=True)
+        file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        handlers.append(logging.handlers.MemoryHandler(
+            capacity=1024, flushLevel=logging.ERROR, target=file_handler
+        ))
+    
     # Configure root logger
-    logging.basicConfig(
-        level=level,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.StreamHandler(sys.stdout),
-            logging.FileHandler('app.log')
-        ]
-    )
+    logging.basicConfig(level=level, format=LOG_FORMAT, handlers=handlers)
+    setup_logging._done = True
     
     # Create a logger for this module
     logger = logging.getLogger(__name__)